@@ -13,6 +13,24 @@ import NoResults from "./components/NoResults";
 
 import './css/App.css';
 
+function generateIdempotencyKey(){
+  // crypto.randomUUID exists only on HTTPS pages and localhost
+  if (window.crypto && crypto.randomUUID){
+    return crypto.randomUUID();
+  }
+  let bytes = new Uint8Array(16);
+  if (window.crypto && crypto.getRandomValues){
+    crypto.getRandomValues(bytes);
+  } else {
+    bytes = bytes.map(() => Math.floor(Math.random() * 256));
+  }
+  // mark the bytes as a random UUID of version 4
+  bytes[6] = (bytes[6] & 0x0f) | 0x40;
+  bytes[8] = (bytes[8] & 0x3f) | 0x80;
+  let hex = Array.from(bytes, byte => byte.toString(16).padStart(2, '0')).join('');
+  return [hex.slice(0, 8), hex.slice(8, 12), hex.slice(12, 16), hex.slice(16, 20), hex.slice(20)].join('-');
+}
+
 class App extends Component {
 
   constructor(props){
@@ -63,21 +81,32 @@ class App extends Component {
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
     try {
+      // the same key is sent on retries, so the server won't register the order twice
+      if (!this.checkoutIdempotencyKey){
+        this.checkoutIdempotencyKey = generateIdempotencyKey();
+      }
+
       let response = await fetch(url, {
         method: 'post',
         headers: {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': this.checkoutIdempotencyKey,
         },
         body: JSON.stringify(data),
       });
 
       if (!response.ok){
+        // the server rejected the order itself, so a corrected order must not reuse the key
+        if (response.status >= 400 && response.status < 500){
+          this.checkoutIdempotencyKey = null;
+        }
         alert('Ошибка при оформлении заказа. Попробуйте ещё раз или свяжитесь с нами по телефону.');
         return;
       }
       let responseData = await response.json();
+      this.checkoutIdempotencyKey = null;
 
       this.setState({
         cart: [],
@@ -137,9 +166,33 @@ class App extends Component {
     });
   }
 
+  readInlineData(elementId){
+    let element = document.getElementById(elementId);
+    if (!element){
+      return null;
+    }
+
+    try {
+      return JSON.parse(element.textContent);
+    } catch (error) {
+      return null;
+    }
+  }
+
   componentDidMount(){
-    this.getProducts();
-    this.getBanners();
+    let products = this.readInlineData('catalog-data');
+    if (products){
+      this.setState({products: products});
+    } else {
+      this.getProducts();
+    }
+
+    let banners = this.readInlineData('banners-data');
+    if (banners){
+      this.setState({banners: banners});
+    } else {
+      this.getBanners();
+    }
   }
 
 
@@ -173,6 +226,7 @@ class App extends Component {
     else {
       cartItems.push(selectedProducts);
     }
+    this.checkoutIdempotencyKey = null;
 
     this.setState({
       cart : cartItems,
@@ -184,6 +238,7 @@ class App extends Component {
     let cart = this.state.cart;
     let index = cart.findIndex((x => x.id == id));
     cart.splice(index, 1);
+    this.checkoutIdempotencyKey = null;
     this.setState({
       cart: cart
     })
@@ -13,7 +13,24 @@ const BannerComponent = (props) => {
   let carousel_items = props.banners.map( (cfg, index) => {
     return (
       <div className={index ? 'item' : 'item active'} key={index}>
-        <img src={cfg.src} alt={cfg.title} style={bannerStyle}/>
+        {cfg.images ? (
+          <picture>
+            <source
+              type="image/webp"
+              srcSet={`${cfg.images.medium.webp} 960w, ${cfg.images.wide.webp} 1920w`}
+              sizes="100vw"
+            />
+            <img
+              src={cfg.images.wide.fallback}
+              srcSet={`${cfg.images.medium.fallback} 960w, ${cfg.images.wide.fallback} 1920w`}
+              sizes="100vw"
+              alt={cfg.title}
+              style={bannerStyle}
+            />
+          </picture>
+        ) : (
+          <img src={cfg.src} alt={cfg.title} style={bannerStyle}/>
+        )}
         <div className="carousel-caption">
           <h3>{cfg.title}</h3>
           <p>{cfg.text}</p>
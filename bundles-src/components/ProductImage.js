@@ -0,0 +1,16 @@
+import React from 'react';
+
+const ProductImage = ({product, variant, ...imgProps}) => {
+  const images = product.images && product.images[variant];
+  if (!images){
+    return <img src={product.image} {...imgProps}/>;
+  }
+  return (
+    <picture>
+      <source srcSet={images.webp} type="image/webp"/>
+      <img src={images.fallback} {...imgProps}/>
+    </picture>
+  )
+};
+
+export default ProductImage;
@@ -1,15 +1,51 @@
-from collections import defaultdict
+import re
 
+import phonenumbers
 from django.contrib import admin
 from django.shortcuts import reverse, redirect
-from django.templatetags.static import static
 from django.utils.html import format_html
 from django.utils.http import url_has_allowed_host_and_scheme
 
-from .models import Product, Order, OrderProduct
+from .models import Banner, Product, Order, OrderProduct
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
+from .paginators import EstimatedCountPaginator
+from .services import get_eligibility_index
+
+
+PHONE_SEARCH_REGION = 'RU'
+PHONE_SEARCH_TERM_RE = re.compile(r'[+\d][\d\s()-]*')
+
+
+def parse_phonenumber(search_term):
+    """Return the search term as an E.164 phone number, or None if it is not one.
+
+    Numbers written the local way, like 8 900 123-45-67, are read in the
+    PHONE_SEARCH_REGION.
+    """
+    if not PHONE_SEARCH_TERM_RE.fullmatch(search_term):
+        return None
+    try:
+        number = phonenumbers.parse(search_term, PHONE_SEARCH_REGION)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def get_image_tag(obj, variant, max_height):
+    variants = obj.get_image_variants()
+    if not variants:
+        return format_html('<img src="{src}" style="max-height: {max_height}px;"/>', src=obj.image.url, max_height=max_height)
+    return format_html(
+        '<picture><source srcset="{webp}" type="image/webp"/>'
+        '<img src="{src}" style="max-height: {max_height}px;"/></picture>',
+        webp=variants[variant]['webp'],
+        src=variants[variant]['fallback'],
+        max_height=max_height,
+    )
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -91,22 +127,20 @@ class ProductAdmin(admin.ModelAdmin):
 
     class Media:
         css = {
-            "all": (
-                static("admin/foodcartapp.css")
-            )
+            "all": ("admin/foodcartapp.css",)
         }
 
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        return get_image_tag(obj, 'card', 200)
     get_image_preview.short_description = 'превью'
 
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        return format_html('<a href="{edit_url}">{image}</a>', edit_url=edit_url, image=get_image_tag(obj, 'thumb', 50))
     get_image_list_preview.short_description = 'превью'
 
 
@@ -124,16 +158,20 @@ class OrderAdmin(admin.ModelAdmin):
         'lastname',
         'phonenumber',
         'cooking_by',
+        'total',
         'available_restaurants_display',
     ]
-    readonly_fields = ['available_restaurants_display']
-    search_fields = ['firstname', 'lastname', 'phonenumber']
+    readonly_fields = ['total', 'available_restaurants_display']
+    search_fields = ['firstname', 'lastname']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fields = [
         'firstname',
         'lastname',
         'phonenumber',
         'address',
         'status',
+        'total',
         'available_restaurants_display',
         'cooking_by',
         'comment',
@@ -142,30 +180,46 @@ class OrderAdmin(admin.ModelAdmin):
         'delivered_at',
     ]
 
-    def available_restaurants_display(self, obj):
+    def available_restaurants_display(self, obj, eligibility_index=None):
+        if eligibility_index is None:
+            eligibility_index = get_eligibility_index()
         order_products = {item.product_id for item in obj.items.all()}
-        available = [
-            self.restaurants[rid] for rid, products in self.restaurant_menu.items()
-            if order_products <= products
-        ]
+        available = eligibility_index.get_restaurants(order_products)
         return ", ".join(r.name for r in available) if available else "-"
 
     available_restaurants_display.short_description = "Доступные рестораны"
 
+    def changelist_view(self, request, extra_context=None):
+        # One cache round trip for the whole page instead of one per row.
+        # The index is kept on the request: the admin instance is shared
+        # between requests and threads.
+        request.eligibility_index = get_eligibility_index()
+        return super().changelist_view(request, extra_context)
+
+    def get_list_display(self, request):
+        def available_restaurants_display(obj):
+            return self.available_restaurants_display(obj, request.eligibility_index)
+
+        available_restaurants_display.short_description = self.available_restaurants_display.short_description
+        return [
+            available_restaurants_display if field == 'available_restaurants_display' else field
+            for field in self.list_display
+        ]
+
     def get_queryset(self, request):
-        queryset = super().get_queryset(request).prefetch_related('items__product')
-        menu_items = (RestaurantMenuItem
-                      .objects
-                      .filter(availability=True)
-                      .select_related('restaurant')
-                      )
-        self.restaurant_menu = defaultdict(set)
+        return super().get_queryset(request).prefetch_related('items')
 
-        for item in menu_items:
-            self.restaurant_menu[item.restaurant_id].add(item.product_id)
+    def get_search_results(self, request, queryset, search_term):
+        # A phone number is looked up by the index alone. Mixing it into
+        # the name search would OR it with ILIKE and scan the table.
+        phonenumber = parse_phonenumber(search_term.strip())
+        if phonenumber:
+            return queryset.filter(phonenumber=phonenumber), False
+        return super().get_search_results(request, queryset, search_term)
 
-        self.restaurants = {restaurant.id: restaurant for restaurant in Restaurant.objects.all()}
-        return queryset
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.update_total()
 
     def response_change(self, request, obj):
         next_url = request.POST.get('next') or request.GET.get('next')
@@ -176,3 +230,41 @@ class OrderAdmin(admin.ModelAdmin):
         ):
             return redirect(next_url)
         return super().response_change(request, obj)
+
+
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'get_image_list_preview',
+        'title',
+        'order',
+        'is_active',
+        'active_from',
+        'active_until',
+    ]
+    list_display_links = ['title']
+    list_editable = ['order', 'is_active']
+    list_filter = ['is_active']
+    readonly_fields = ['get_image_preview']
+    fields = [
+        'title',
+        'text',
+        'image',
+        'get_image_preview',
+        'order',
+        'is_active',
+        'active_from',
+        'active_until',
+    ]
+
+    def get_image_preview(self, obj):
+        if not obj.image:
+            return 'выберите картинку'
+        return get_image_tag(obj, 'medium', 200)
+    get_image_preview.short_description = 'превью'
+
+    def get_image_list_preview(self, obj):
+        if not obj.image:
+            return 'нет картинки'
+        return get_image_tag(obj, 'medium', 50)
+    get_image_list_preview.short_description = 'превью'
@@ -0,0 +1,127 @@
+"""Helpers for the benchmark_* management commands.
+
+Benchmarks seed synthetic data inside a transaction that is rolled back
+at the end, so they leave the database as it was. Run them on a copy of
+the production database or a development one: seeding thousands of rows
+still loads the server.
+"""
+
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodcartapp.models import Order, OrderProduct, Product, Restaurant, RestaurantMenuItem
+from foodcartapp.services import bump_banners_version, bump_menu_version, bump_restaurants_grid_version
+from geolocations.models import Location
+
+
+def measure(func, repeat=3):
+    """Return the best wall time of `repeat` calls of func, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def format_timing(title, seconds, count=None):
+    line = f'{title}: {seconds * 1000:.1f} мс'
+    if count:
+        line += f' ({count / seconds:.0f} в секунду)'
+    return line
+
+
+class BenchmarkCommand(BaseCommand):
+    """Runs `benchmark()` in a transaction that is always rolled back.
+
+    Cached menu data built from the seeded rows is dropped afterwards by
+    bumping the versions it is keyed by.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Сколько раз повторять каждый замер')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора синтетических данных')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                bump_menu_version()
+                self.benchmark(**options)
+                transaction.set_rollback(True)
+        finally:
+            bump_menu_version()
+            bump_banners_version()
+            bump_restaurants_grid_version()
+
+    def benchmark(self, **options):
+        raise NotImplementedError
+
+    def report(self, title, seconds, count=None):
+        self.stdout.write(format_timing(title, seconds, count))
+
+
+def seed_menu(random_generator, restaurants_count, products_count, menu_share=0.8):
+    """Create products and restaurants, each restaurant selling a share of the products."""
+    products = Product.objects.bulk_create(
+        Product(name=f'Бенчмарк, продукт {number}', price=Decimal(100 + number % 400), image='product.jpg')
+        for number in range(products_count)
+    )
+    restaurants = Restaurant.objects.bulk_create(
+        Restaurant(name=f'Бенчмарк, ресторан {number}', address=f'Бенчмарк, ресторан {number}')
+        for number in range(restaurants_count)
+    )
+    RestaurantMenuItem.objects.bulk_create(
+        (
+            RestaurantMenuItem(restaurant=restaurant, product=product)
+            for restaurant in restaurants
+            for product in products
+            if random_generator.random() < menu_share
+        ),
+        batch_size=5000,
+    )
+    return products, restaurants
+
+
+def seed_orders(random_generator, orders_count, products, cart_size=3):
+    """Create open orders with distinct addresses and random carts."""
+    orders = Order.objects.bulk_create(
+        (
+            Order(
+                firstname='Иван',
+                lastname='Иванов',
+                phonenumber='+79001234567',
+                address=f'Бенчмарк, заказ {number}',
+            )
+            for number in range(orders_count)
+        ),
+        batch_size=2000,
+    )
+    OrderProduct.objects.bulk_create(
+        (
+            OrderProduct(order=order, product=product, quantity=1, final_price=product.price)
+            for order in orders
+            for product in random_generator.sample(products, cart_size)
+        ),
+        batch_size=5000,
+    )
+    return orders
+
+
+def seed_locations(random_generator, addresses):
+    """Give every address random coordinates around Moscow."""
+    return Location.objects.bulk_create(
+        (
+            Location(
+                address=address,
+                lat=Decimal(f'{random_generator.uniform(55.55, 55.95):.6f}'),
+                lng=Decimal(f'{random_generator.uniform(37.35, 37.85):.6f}'),
+            )
+            for address in addresses
+        ),
+        batch_size=5000,
+    )
@@ -0,0 +1,101 @@
+import hashlib
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+IMAGE_VARIANTS = {
+    'thumb': (100, 100),
+    'card': (500, 500),
+    'large': (800, 800),
+}
+BANNER_IMAGE_VARIANTS = {
+    'medium': (960, 600),
+    'wide': (1920, 1200),
+}
+VARIANTS_DIR = 'variants'
+FALLBACK_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def get_content_hash(file):
+    content_hash = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        content_hash.update(chunk)
+    file.seek(0)
+    return content_hash.hexdigest()
+
+
+def get_fallback_extension(image_name):
+    extension = os.path.splitext(image_name)[1].lower()
+    return extension if extension in FALLBACK_FORMATS else '.png'
+
+
+def get_variant_name(content_hash, variant, extension):
+    """Storage name of a variant. Names change with the content, so files can be cached forever."""
+    return f'{VARIANTS_DIR}/{content_hash[:2]}/{content_hash}-{variant}{extension}'
+
+
+def get_image_variant_urls(image_name, content_hash, variants=IMAGE_VARIANTS):
+    """Return {variant: {'webp': url, 'fallback': url}} or None if variants are not generated yet."""
+    if not image_name or not content_hash:
+        return None
+    fallback_extension = get_fallback_extension(image_name)
+    return {
+        variant: {
+            'webp': default_storage.url(get_variant_name(content_hash, variant, '.webp')),
+            'fallback': default_storage.url(get_variant_name(content_hash, variant, fallback_extension)),
+        }
+        for variant in variants
+    }
+
+
+def save_image(image, name, image_format):
+    if default_storage.exists(name):
+        return
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    options = {
+        'WEBP': {'quality': WEBP_QUALITY, 'method': 6},
+        'JPEG': {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True},
+        'PNG': {'optimize': True},
+    }[image_format]
+    content = ContentFile(b'')
+    image.save(content, format=image_format, **options)
+    default_storage.save(name, content)
+
+
+def generate_image_variants(image_name, variants=IMAGE_VARIANTS):
+    """Create resized WebP and fallback copies of a stored image.
+
+    Variants already present in the storage are kept. Returns the content
+    hash the variant names are built from.
+    """
+    with default_storage.open(image_name, 'rb') as file:
+        content_hash = get_content_hash(file)
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    fallback_extension = get_fallback_extension(image_name)
+    for variant, size in variants.items():
+        image = original.copy()
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        save_image(image, get_variant_name(content_hash, variant, '.webp'), 'WEBP')
+        save_image(
+            image,
+            get_variant_name(content_hash, variant, fallback_extension),
+            FALLBACK_FORMATS[fallback_extension],
+        )
+    return content_hash
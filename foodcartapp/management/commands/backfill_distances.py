@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Order
+from geolocations.services import get_distances
+
+
+class Command(BaseCommand):
+    help = 'Рассчитывает расстояния от ресторанов до адресов открытых заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        orders = (Order.objects
+                  .exclude(status='completed')
+                  .order_by('id')
+                  .available_for_order())
+        pairs = list({
+            (order.address, restaurant.address)
+            for order in orders
+            for restaurant in order.available_restaurants
+        })
+
+        batch_size = options['batch_size']
+        known = 0
+        for start in range(0, len(pairs), batch_size):
+            distances = get_distances(pairs[start:start + batch_size])
+            known += sum(distance is not None for distance in distances.values())
+
+        self.stdout.write(f'Пар адресов: {len(pairs)}, с известным расстоянием: {known}')
@@ -0,0 +1,54 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенный сайт параллельными запросами. Запустите сайт под gunicorn '
+        'и под uvicorn с одинаковым числом воркеров и сравните результаты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', default='http://127.0.0.1:8000/api/products/')
+        parser.add_argument(
+            '--concurrency', type=int, default=50, help='Сколько запросов держать открытыми одновременно',
+        )
+        parser.add_argument('--requests', type=int, default=1000, help='Сколько запросов отправить всего')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        sessions = threading.local()
+
+        def fetch(_):
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+            started_at = time.perf_counter()
+            try:
+                response = sessions.session.get(options['url'], timeout=options['timeout'])
+            except requests.RequestException:
+                return None
+            return response.status_code, time.perf_counter() - started_at
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            started_at = time.perf_counter()
+            results = list(executor.map(fetch, range(options['requests'])))
+            elapsed = time.perf_counter() - started_at
+
+        latencies = sorted(latency for status, latency in filter(None, results) if status == 200)
+        if not latencies:
+            statuses = sorted({result[0] for result in results if result})
+            raise CommandError(f'Ни один запрос к {options["url"]} не завершился успешно, ответы сервера: {statuses}')
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+
+        self.stdout.write(f'{options["url"]}, параллельных запросов: {options["concurrency"]}')
+        self.stdout.write(f'Успешных ответов: {len(latencies)} из {len(results)}')
+        self.stdout.write(f'Пропускная способность: {len(latencies) / elapsed:.0f} запросов в секунду')
+        self.stdout.write(
+            f'Задержка: медиана {percentiles[49] * 1000:.1f} мс, '
+            f'95-й перцентиль {percentiles[94] * 1000:.1f} мс, максимум {latencies[-1] * 1000:.1f} мс'
+        )
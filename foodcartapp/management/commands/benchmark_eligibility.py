@@ -0,0 +1,62 @@
+from foodcartapp.benchmarks import BenchmarkCommand, measure, seed_menu, seed_orders
+from foodcartapp.models import Order, Restaurant
+from foodcartapp.services import bump_menu_version, eligibility_memo
+from foodcartapp.services import get_available_restaurants_from_db, get_available_restaurants_from_index
+
+
+def get_available_restaurants_by_subsets(order_ids):
+    """The replaced algorithm: every cart is checked against every restaurant menu."""
+    restaurants = Restaurant.objects.prefetch_related('menu_items__product')
+    menus = [
+        (restaurant, {item.product for item in restaurant.menu_items.all() if item.availability})
+        for restaurant in restaurants
+    ]
+    orders = Order.objects.filter(id__in=order_ids).prefetch_related('items__product')
+    return {
+        order.id: [
+            restaurant for restaurant, menu in menus
+            if {item.product for item in order.items.all()}.issubset(menu)
+        ]
+        for order in orders
+    }
+
+
+class Command(BenchmarkCommand):
+    help = 'Сравнивает скорость поиска ресторанов, способных приготовить заказы'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--restaurants', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=100)
+
+    def benchmark(self, **options):
+        products, _ = seed_menu(self.random, options['restaurants'], options['products'])
+        orders = seed_orders(self.random, options['orders'], products)
+        order_ids = [order.id for order in orders]
+        self.stdout.write(
+            f'Ресторанов: {options["restaurants"]}, заказов: {options["orders"]}, товаров: {options["products"]}'
+        )
+
+        def rebuild_index():
+            eligibility_memo.clear()
+            bump_menu_version()
+            get_available_restaurants_from_index(order_ids)
+
+        repeat = options['repeat']
+        self.report('Перебор меню (старый способ)', measure(lambda: get_available_restaurants_by_subsets(order_ids), 1))
+        self.report('Битовый индекс, с построением индекса', measure(rebuild_index, repeat))
+        self.report(
+            'Битовый индекс, индекс в памяти',
+            measure(lambda: get_available_restaurants_from_index(order_ids), repeat),
+        )
+        self.report('Групповой SQL-запрос', measure(lambda: get_available_restaurants_from_db(order_ids), repeat))
+
+        expected = get_available_restaurants_by_subsets(order_ids)
+        actual = get_available_restaurants_from_index(order_ids)
+        mismatches = sum(
+            [restaurant.id for restaurant in expected[order_id]]
+            != [restaurant.id for restaurant in actual.get(order_id, [])]
+            for order_id in order_ids
+        )
+        self.stdout.write(f'Расхождений с перебором: {mismatches}')
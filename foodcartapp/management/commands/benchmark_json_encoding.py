@@ -0,0 +1,57 @@
+import json
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from foodcartapp.benchmarks import format_timing, measure
+from foodcartapp.models import Product, ProductCategory
+from foodcartapp.services import dump_json, serialize_product
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время кодирования и размер JSON каталога в старом и новом формате'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        category = ProductCategory(id=1, name='Бургеры')
+        products = [
+            Product(
+                id=number,
+                name=f'Бургер номер {number}',
+                price=Decimal(f'{100 + number % 900}.50'),
+                description='Сочная котлета, свежие овощи и фирменный соус на мягкой булочке. ' * 3,
+                category=category,
+                image=f'product-{number}.jpg',
+                image_hash=f'{number:064x}',
+            )
+            for number in range(options['products'])
+        ]
+
+        dumped_products = [serialize_product(product) for product in products]
+        # What the API built before: Decimal prices, encoded by DjangoJSONEncoder's default() hook
+        decimal_products = [
+            {**dumped_product, 'price': product.price}
+            for dumped_product, product in zip(dumped_products, products)
+        ]
+
+        def encode_indented():
+            return json.dumps(decimal_products, cls=DjangoJSONEncoder, ensure_ascii=False, indent=4).encode('utf-8')
+
+        def encode_compact():
+            return dump_json(dumped_products)
+
+        def encode_pretty():
+            return dump_json(dumped_products, pretty=True)
+
+        self.stdout.write(f'Товаров: {options["products"]}')
+        for title, encode in [
+            ('С отступами через DjangoJSONEncoder (старый способ)', encode_indented),
+            ('Компактно (по умолчанию)', encode_compact),
+            ('С отступами, ?pretty=1', encode_pretty),
+        ]:
+            seconds = measure(encode, options['repeat'])
+            self.stdout.write(f'{format_timing(title, seconds)}, {len(encode()) / 1024:.0f} КБ')
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+from geopy.distance import geodesic
+
+from foodcartapp.benchmarks import BenchmarkCommand, measure, seed_locations, seed_menu, seed_orders
+from foodcartapp.models import Order
+from foodcartapp.services import get_available_restaurants
+from geolocations.models import Distance
+from geolocations.services import get_addresses_coordinates
+from restaurateur.views import get_order_items, view_orders
+
+
+def get_geodesic_distances(orders):
+    """The replaced approach: geodesic() for every order and eligible restaurant on every render."""
+    restaurants_by_order = get_available_restaurants([order.id for order in orders])
+    addresses = {order.address for order in orders} | {
+        restaurant.address
+        for restaurants in restaurants_by_order.values()
+        for restaurant in restaurants
+    }
+    coordinates = get_addresses_coordinates(addresses)
+    return {
+        (order.address, restaurant.address): geodesic(coordinates[order.address], coordinates[restaurant.address]).km
+        for order in orders
+        for restaurant in restaurants_by_order.get(order.id, [])
+    }
+
+
+class Command(BenchmarkCommand):
+    help = 'Замеряет, сколько времени строится доска заказов менеджера с расстояниями до ресторанов'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--restaurants', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--products', type=int, default=50)
+
+    def benchmark(self, **options):
+        products, restaurants = seed_menu(self.random, options['restaurants'], options['products'])
+        seed_orders(self.random, options['orders'], products)
+        orders = list(Order.objects.on_board())
+        seed_locations(
+            self.random,
+            [restaurant.address for restaurant in restaurants] + [order.address for order in orders],
+        )
+        self.stdout.write(f'Ресторанов: {options["restaurants"]}, открытых заказов: {len(orders)}')
+
+        repeat = options['repeat']
+        self.report(
+            'Все заказы, geodesic на каждую пару (старый способ)',
+            measure(lambda: get_geodesic_distances(orders), repeat),
+        )
+        self.report('Все заказы, матрица расстояний пуста', measure(lambda: get_order_items(orders), 1))
+        self.stdout.write(f'Сохранено расстояний: {Distance.objects.count()}')
+        self.report('Все заказы, расстояния из матрицы', measure(lambda: get_order_items(orders), repeat))
+
+        request = RequestFactory().get('/manager/orders/')
+        request.user = User.objects.create_user('benchmark-manager', is_staff=True)
+        self.report('Страница доски заказов', measure(lambda: view_orders(request), repeat))
@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from foodcartapp.benchmarks import BenchmarkCommand, measure, seed_menu
+from foodcartapp.testing import make_order_payload
+from foodcartapp.views import register_order, register_orders_batch
+
+
+class Command(BenchmarkCommand):
+    help = 'Сравнивает, сколько заказов в секунду принимают обычный и пакетный API'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--products', type=int, default=50)
+
+    def post(self, view, payload, **headers):
+        request = self.factory.post(
+            '/api/order/',
+            json.dumps(payload, ensure_ascii=False),
+            content_type='application/json',
+            headers=headers,
+        )
+        response = view(request)
+        response.render()
+        if response.status_code != 200:
+            raise CommandError(f'API ответил {response.status_code}: {response.content[:200]!r}')
+
+    def benchmark(self, **options):
+        self.factory = RequestFactory()
+        products, _ = seed_menu(self.random, 10, options['products'])
+        orders = [
+            make_order_payload([
+                {'product': product.id, 'quantity': 1}
+                for product in self.random.sample(products, 3)
+            ])
+            for _ in range(options['orders'])
+        ]
+        batch_size = options['batch_size']
+        batches = [orders[start:start + batch_size] for start in range(0, len(orders), batch_size)]
+        partner = User.objects.create_user('benchmark-partner')
+        authorization = f'Token {Token.objects.create(user=partner).key}'
+        self.stdout.write(f'Заказов: {len(orders)}, в пачке: {batch_size}')
+
+        def register_one_by_one():
+            for order in orders:
+                self.post(register_order, order)
+
+        def register_in_batches():
+            for batch in batches:
+                self.post(register_orders_batch, batch, authorization=authorization)
+
+        # Each pass creates real orders, so throttling allows few repeats of the batch API
+        self.report('/api/order/ по одному заказу', measure(register_one_by_one, 1), len(orders))
+        self.report('/api/order/batch/', measure(register_in_batches, 1), len(orders))
@@ -0,0 +1,39 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from foodcartapp.models import Banner
+
+
+DEFAULT_BANNERS = [
+    ('Burger', 'Tasty Burger at your door step', 'burger.jpg'),
+    ('Spices', 'All Cuisines', 'food.jpg'),
+    ('New York', 'Food is incomplete without a tasty dessert', 'tasty.jpg'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Создаёт стандартные баннеры главной страницы, если баннеров ещё нет'
+
+    def handle(self, *args, **options):
+        if Banner.objects.exists():
+            self.stdout.write('Баннеры уже есть, ничего не создано')
+            return
+
+        created = 0
+        for order, (title, text, filename) in enumerate(DEFAULT_BANNERS):
+            asset_path = os.path.join(settings.BASE_DIR, 'assets', filename)
+            if not os.path.exists(asset_path):
+                self.stderr.write(f'Нет картинки {asset_path}')
+                continue
+
+            image_name = f'banners/{filename}'
+            if not default_storage.exists(image_name):
+                with open(asset_path, 'rb') as asset:
+                    image_name = default_storage.save(image_name, File(asset))
+            Banner.objects.create(title=title, text=text, image=image_name, order=order)
+            created += 1
+        self.stdout.write(f'Создано баннеров: {created}')
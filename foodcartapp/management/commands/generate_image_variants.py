@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from foodcartapp.images import BANNER_IMAGE_VARIANTS, IMAGE_VARIANTS, generate_image_variants
+from foodcartapp.models import Banner, Product
+from foodcartapp.services import bump_banners_version, bump_menu_version
+
+
+def generate_variants(image_name, variants):
+    try:
+        return generate_image_variants(image_name, variants), None
+    except OSError as error:
+        return None, str(error)
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии и WebP-версии картинок товаров и баннеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None)
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать и картинки, для которых копии уже созданы',
+        )
+
+    def handle(self, *args, **options):
+        sources = [
+            (Product, IMAGE_VARIANTS, bump_menu_version),
+            (Banner, BANNER_IMAGE_VARIANTS, bump_banners_version),
+        ]
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup) as executor:
+            for model, variants, bump_version in sources:
+                self.process(executor, model, variants, options['all'])
+                bump_version()
+
+    def process(self, executor, model, variants, process_all):
+        objects = model.objects.exclude(image='')
+        if not process_all:
+            objects = objects.filter(image_hash='')
+        objects = list(objects.only('id', 'image', 'image_hash'))
+        if not objects:
+            self.stdout.write(f'{model._meta.verbose_name_plural}: все картинки уже обработаны')
+            return
+
+        image_names = [obj.image.name for obj in objects]
+        results = executor.map(generate_variants, image_names, [variants] * len(objects))
+
+        updated_objects = []
+        for obj, (content_hash, error) in zip(objects, results):
+            if error:
+                self.stderr.write(f'{obj.image.name}: {error}')
+                continue
+            obj.image_hash = content_hash
+            updated_objects.append(obj)
+
+        model.objects.bulk_update(updated_objects, ['image_hash'], batch_size=500)
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: обработано картинок {len(updated_objects)} из {len(objects)}'
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.services import prune_distances
+
+
+class Command(BaseCommand):
+    help = 'Удаляет расстояния до адресов, по которым больше нет открытых заказов'
+
+    def handle(self, *args, **options):
+        deleted = prune_distances()
+        self.stdout.write(f'Удалено расстояний: {deleted}')
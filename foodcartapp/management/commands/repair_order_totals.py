@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает стоимость заказов, разошедшуюся с суммой по их позициям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько заказов нужно исправить',
+        )
+
+    def handle(self, *args, **options):
+        drifted_ids = list(
+            Order.objects
+            .with_computed_total()
+            .exclude(total=F('computed_total'))
+            .values_list('id', flat=True)
+        )
+        self.stdout.write(f'Заказов с неверной стоимостью: {len(drifted_ids)}')
+        if options['dry_run']:
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(drifted_ids), batch_size):
+            Order.objects.filter(id__in=drifted_ids[start:start + batch_size]).update_totals()
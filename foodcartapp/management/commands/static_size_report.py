@@ -0,0 +1,45 @@
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+
+
+def get_size(storage, name):
+    return storage.size(name) if storage.exists(name) else None
+
+
+def format_size(size):
+    return '—' if size is None else f'{size / 1024:.1f} КБ'
+
+
+class Command(BaseCommand):
+    help = 'Показывает размеры собранной статики без сжатия, в gzip и brotli'
+
+    def handle(self, *args, **options):
+        if not isinstance(staticfiles_storage, ManifestFilesMixin):
+            raise CommandError('Отчёт строится по манифесту collectstatic, запустите команду с DEBUG=False')
+        hashed_files = staticfiles_storage.hashed_files
+        if not hashed_files:
+            raise CommandError('Манифест статики не найден, сначала запустите collectstatic')
+
+        rows = []
+        for hashed_name in sorted(set(hashed_files.values())):
+            rows.append((
+                hashed_name,
+                get_size(staticfiles_storage, hashed_name),
+                get_size(staticfiles_storage, f'{hashed_name}.gz'),
+                get_size(staticfiles_storage, f'{hashed_name}.br'),
+            ))
+        rows.sort(key=lambda row: row[1] or 0, reverse=True)
+
+        name_width = max(len(row[0]) for row in rows)
+        self.stdout.write(f'{"Файл":<{name_width}}  {"Исходный":>12}  {"gzip":>12}  {"brotli":>12}')
+        for name, size, gzip_size, brotli_size in rows:
+            self.stdout.write(
+                f'{name:<{name_width}}  {format_size(size):>12}  '
+                f'{format_size(gzip_size):>12}  {format_size(brotli_size):>12}'
+            )
+
+        total_size = sum(row[1] or 0 for row in rows)
+        total_sent = sum(min(size for size in row[1:] if size is not None) for row in rows if row[1] is not None)
+        self.stdout.write(
+            f'Всего: {format_size(total_size)}, с учётом сжатия: {format_size(total_sent)}'
+        )
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_order_total(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    OrderProduct = apps.get_model('foodcartapp', 'OrderProduct')
+
+    items_total = (OrderProduct.objects
+                   .filter(order=OuterRef('pk'))
+                   .values('order')
+                   .annotate(total=Sum(F('final_price') * F('quantity')))
+                   .values('total'))
+    Order.objects.update(total=Coalesce(
+        Subquery(items_total),
+        Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0058_order_total'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_order_total, migrations.RunPython.noop),
+    ]
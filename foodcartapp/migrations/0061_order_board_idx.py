@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0060_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(models.Case(models.When(status='waiting_for_acceptation', then=models.Value(0)), models.When(status='sent_to_restaurant', then=models.Value(1)), models.When(status='given_to_courier', then=models.Value(2)), default=models.Value(99), output_field=models.IntegerField()), models.F('registrated_at'), models.F('id'), condition=models.Q(('status', 'completed'), _negated=True), name='order_board_idx'),
+        ),
+    ]
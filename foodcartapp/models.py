@@ -1,11 +1,13 @@
-from collections import defaultdict
-
 from django.db import models
 from django.core.validators import MinValueValidator
-from django.db.models import Sum, F, DecimalField
+from django.db.models import Sum, F, DecimalField, OuterRef, Subquery, Value
+from django.db.models import Case, When, IntegerField, Q
+from django.db.models.functions import Coalesce, Now
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
+from .images import BANNER_IMAGE_VARIANTS, get_image_variant_urls
+
 
 class Restaurant(models.Model):
     name = models.CharField(
@@ -72,6 +74,12 @@ class Product(models.Model):
     image = models.ImageField(
         'картинка'
     )
+    image_hash = models.CharField(
+        'хэш картинки',
+        max_length=64,
+        blank=True,
+        editable=False,
+    )
     special_status = models.BooleanField(
         'спец.предложение',
         default=False,
@@ -92,6 +100,9 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    def get_image_variants(self):
+        return get_image_variant_urls(self.image.name, self.image_hash)
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -123,26 +134,70 @@ class RestaurantMenuItem(models.Model):
         return f'{self.restaurant.name} - {self.product.name}'
 
 
+ORDER_STATUS_ORDER = Case(
+    When(status='waiting_for_acceptation', then=Value(0)),
+    When(status='sent_to_restaurant', then=Value(1)),
+    When(status='given_to_courier', then=Value(2)),
+    default=Value(99),
+    output_field=IntegerField(),
+)
+
+
 class OrderQuerySet(models.QuerySet):
+    def on_board(self):
+        """Unfinished orders in the order of the manager board.
+
+        The filter and the sort repeat the `order_board_idx` index, so a
+        page of the board is read straight from it.
+        """
+        return (
+            self.exclude(status='completed')
+            .annotate(status_order=ORDER_STATUS_ORDER)
+            .order_by('status_order', 'registrated_at', 'id')
+        )
+
+    def after(self, status_order, registrated_at, order_id):
+        """Orders following the given one in the board order.
+
+        The leading `status_order` bound gives the database a start point in
+        `order_board_idx`; the OR alone would make it scan the index from
+        the beginning.
+        """
+        return self.filter(
+            Q(status_order__gte=status_order),
+            Q(status_order__gt=status_order)
+            | Q(registrated_at__gt=registrated_at)
+            | Q(registrated_at=registrated_at, id__gt=order_id),
+        )
+
     def available_for_order(self):
-        restaurants = Restaurant.objects.prefetch_related('menu_items__product')
-        restaurant_menu = defaultdict(set)
+        from foodcartapp.services import get_available_restaurants
 
-        for restaurant in restaurants:
-            for item in restaurant.menu_items.all():
-                restaurant_menu[restaurant].add(item.product)
+        restaurants_by_order = get_available_restaurants([order.id for order in self])
 
         for order in self:
-            products = set(item.product for item in order.items.all())
-            available_restaurants = []
+            order.available_restaurants = restaurants_by_order.get(order.id, [])
 
-            for restaurant, menu_products in restaurant_menu.items():
-                if products.issubset(menu_products):
-                    available_restaurants.append(restaurant)
+        return self
 
-            order.available_restaurants = available_restaurants
+    @staticmethod
+    def get_items_total():
+        items_total = (OrderProduct.objects
+                       .filter(order=OuterRef('pk'))
+                       .values('order')
+                       .annotate(total=Sum(F('final_price') * F('quantity')))
+                       .values('total'))
+        return Coalesce(
+            Subquery(items_total),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
 
-        return self
+    def with_computed_total(self):
+        return self.annotate(computed_total=self.get_items_total())
+
+    def update_totals(self):
+        return self.update(total=self.get_items_total(), updated_at=Now())
 
 
 class Order(models.Model):
@@ -195,12 +250,24 @@ class Order(models.Model):
         null=True,
         verbose_name='Дата и время доставки'
     )
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        verbose_name='Стоимость заказа'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата и время изменения'
+    )
 
-    def total_price(self):
-        result = self.items.aggregate(
+    def update_total(self):
+        self.total = self.items.aggregate(
             total=Sum(F('final_price') * F('quantity'), output_field=DecimalField())
-        )['total']
-        return result or 0
+        )['total'] or 0
+        self.save(update_fields=['total', 'updated_at'])
 
     objects = OrderQuerySet.as_manager()
 
@@ -217,6 +284,13 @@ class Order(models.Model):
                     'payment_method'
                 ]
             ),
+            models.Index(
+                ORDER_STATUS_ORDER,
+                'registrated_at',
+                'id',
+                name='order_board_idx',
+                condition=~Q(status='completed'),
+            ),
         ]
 
     def __str__(self):
@@ -254,3 +328,65 @@ class OrderProduct(models.Model):
 
     def __str__(self):
         return f'{self.product.name} x{self.quantity}'
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField('ключ', max_length=255, unique=True)
+    fingerprint = models.CharField('отпечаток запроса', max_length=64)
+    order = models.ForeignKey(
+        Order,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='заказ'
+    )
+    status_code = models.PositiveSmallIntegerField('код ответа', null=True)
+    response = models.JSONField('ответ', null=True)
+    created_at = models.DateTimeField('создан', default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
+
+
+class BannerQuerySet(models.QuerySet):
+    def active(self, now=None):
+        now = now or timezone.now()
+        return self.filter(
+            Q(active_from__isnull=True) | Q(active_from__lte=now),
+            Q(active_until__isnull=True) | Q(active_until__gt=now),
+            is_active=True,
+        )
+
+
+class Banner(models.Model):
+    title = models.CharField('заголовок', max_length=100)
+    text = models.CharField('текст', max_length=200, blank=True)
+    image = models.ImageField('картинка')
+    image_hash = models.CharField(
+        'хэш картинки',
+        max_length=64,
+        blank=True,
+        editable=False,
+    )
+    order = models.PositiveIntegerField('порядок', default=0, db_index=True)
+    is_active = models.BooleanField('показывать', default=True, db_index=True)
+    active_from = models.DateTimeField('показывать с', null=True, blank=True)
+    active_until = models.DateTimeField('показывать до', null=True, blank=True)
+
+    objects = BannerQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['order', 'id']
+
+    def __str__(self):
+        return self.title
+
+    def get_image_variants(self):
+        return get_image_variant_urls(self.image.name, self.image_hash, BANNER_IMAGE_VARIANTS)
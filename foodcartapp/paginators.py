@@ -0,0 +1,37 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts planner statistics for big unfiltered tables.
+
+    An exact COUNT(*) over millions of rows reads the whole table, while
+    PostgreSQL keeps a row estimate in pg_class that is refreshed by
+    autovacuum. The estimate is used only when the queryset is not
+    filtered and the table holds more than `estimate_threshold` rows,
+    other lists are counted exactly.
+    """
+
+    estimate_threshold = 100_000
+
+    def get_estimated_count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimated_count = self.get_estimated_count()
+            if estimated_count is not None and estimated_count > self.estimate_threshold:
+                return estimated_count
+        return super().count
@@ -1,13 +1,68 @@
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from phonenumber_field.serializerfields import PhoneNumberField
-from rest_framework.serializers import PrimaryKeyRelatedField
+from rest_framework.serializers import PrimaryKeyRelatedField, ListSerializer
 from rest_framework.serializers import Serializer, DecimalField
 from rest_framework.serializers import CharField, IntegerField
 
 from foodcartapp.models import Product
+from geolocations.models import ADDRESS_MAX_LENGTH
+
+
+def get_products_ids(products_data):
+    return [item.get('product') for item in products_data if isinstance(item, Mapping)]
+
+
+class PreloadedPrimaryKeyRelatedField(PrimaryKeyRelatedField):
+    """Resolves primary keys from `preloaded` objects instead of a query per value.
+
+    Falls back to the regular lookup when nothing was preloaded.
+    """
+    preloaded = None
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            raise ValueError
+
+    def preload(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(value))
+            except (TypeError, ValueError):
+                continue
+        pks.discard(None)
+        self.preloaded = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.preloaded is None:
+            return super().to_internal_value(data)
+
+        try:
+            return self.preloaded[self.to_pk(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class ProductInOrderListSerializer(ListSerializer):
+    def to_internal_value(self, data):
+        product_field = self.child.fields['product']
+        if 'preloaded_products' in self.context:
+            product_field.preloaded = self.context['preloaded_products']
+        elif isinstance(data, list):
+            product_field.preload(get_products_ids(data))
+        return super().to_internal_value(data)
 
 
 class ProductInOrderSerializer(Serializer):
-    product = PrimaryKeyRelatedField(queryset=Product.objects.all())
+    product = PreloadedPrimaryKeyRelatedField(queryset=Product.objects.all())
     quantity = IntegerField(min_value=1)
     final_price = DecimalField(
         max_digits=10,
@@ -15,14 +70,34 @@ class ProductInOrderSerializer(Serializer):
         read_only=True
     )
 
+    class Meta:
+        list_serializer_class = ProductInOrderListSerializer
+
+
 class OrderSerializer(Serializer):
     firstname = CharField(error_messages={'required': 'Обязательное поле'})
     lastname = CharField(error_messages={'required': 'Обязательное поле'})
     phonenumber = PhoneNumberField(error_messages={'required': 'Обязательное поле'})
-    address = CharField(error_messages={'required': 'Обязательное поле'})
+    address = CharField(max_length=ADDRESS_MAX_LENGTH, error_messages={'required': 'Обязательное поле'})
     products = ProductInOrderSerializer(
         many=True,
         write_only=True,
         allow_empty=False,
         error_messages={'empty': 'Список продуктов не может быть пустым'}
     )
+
+
+def preload_order_products(orders_data):
+    """Load the products of all orders with one query.
+
+    The result is passed to OrderSerializer as the `preloaded_products`
+    context value.
+    """
+    products_ids = []
+    for order_data in orders_data:
+        if isinstance(order_data, Mapping) and isinstance(order_data.get('products'), list):
+            products_ids.extend(get_products_ids(order_data['products']))
+
+    product_field = PreloadedPrimaryKeyRelatedField(queryset=Product.objects.all())
+    product_field.preload(products_ids)
+    return product_field.preloaded
@@ -0,0 +1,589 @@
+import datetime
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from foodcartapp.images import BANNER_IMAGE_VARIANTS, IMAGE_VARIANTS, generate_image_variants
+from foodcartapp.models import Banner, IdempotencyKey, Order, OrderProduct, Product, Restaurant, RestaurantMenuItem
+from geolocations.models import Distance, Location
+from geolocations.services import enqueue_geocoding
+from geolocations.services import get_addresses_coordinates, get_coordinates, save_distances
+from geolocations.spatial import SpatialGrid
+
+
+MENU_VERSION_KEY = 'foodcartapp:menu_version'
+BANNERS_VERSION_KEY = 'foodcartapp:banners_version'
+RESTAURANTS_GRID_VERSION_KEY = 'foodcartapp:restaurants_grid_version'
+BANNERS_KEY_TEMPLATE = 'foodcartapp:banners:{version}:{variant}'
+CATALOG_KEY_TEMPLATE = 'foodcartapp:catalog:{version}:{variant}'
+CATALOG_TIMEOUT = 24 * 60 * 60
+ELIGIBILITY_KEY_TEMPLATE = 'foodcartapp:eligibility:{version}'
+RESTAURANTS_GRID_KEY_TEMPLATE = 'foodcartapp:restaurants_grid:{version}'
+
+# Encoders are built once: json.dumps() with custom options creates
+# a new encoder on every call.
+compact_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+pretty_encoder = json.JSONEncoder(ensure_ascii=False, indent=4)
+
+
+def dump_json(data, pretty=False):
+    encoder = pretty_encoder if pretty else compact_encoder
+    return encoder.encode(data).encode('utf-8')
+
+
+# Same escapes as the json_script template filter uses.
+SCRIPT_JSON_ESCAPES = {
+    ord('>'): '\\u003E',
+    ord('<'): '\\u003C',
+    ord('&'): '\\u0026',
+}
+
+
+def embed_json(payload):
+    """Make an encoded payload safe to put inside a <script> element."""
+    return mark_safe(payload.decode('utf-8').translate(SCRIPT_JSON_ESCAPES))
+
+
+def is_pretty_requested(request):
+    return request.GET.get('pretty') == '1'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    version = max(time.time_ns(), get_version(key) + 1)
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def get_menu_version():
+    return get_version(MENU_VERSION_KEY)
+
+
+async def aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    return version
+
+
+async def aget_menu_version():
+    return await aget_version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    return bump_version(MENU_VERSION_KEY)
+
+
+def bump_banners_version():
+    return bump_version(BANNERS_VERSION_KEY)
+
+
+def bump_restaurants_grid_version():
+    return bump_version(RESTAURANTS_GRID_VERSION_KEY)
+
+
+def get_menu_modified_at(version=None):
+    if version is None:
+        version = get_menu_version()
+    return datetime.datetime.fromtimestamp(version / 10 ** 9, tz=datetime.timezone.utc)
+
+
+def update_image_variants(instance, variants=IMAGE_VARIANTS):
+    """Generate image variants of a product or a banner and remember their hash.
+
+    An unreadable image is left without variants: the original is served
+    until `generate_image_variants` command is run for it.
+    """
+    try:
+        instance.image_hash = generate_image_variants(instance.image.name, variants)
+    except OSError:
+        return False
+    type(instance).objects.filter(pk=instance.pk).update(image_hash=instance.image_hash)
+    return True
+
+
+def update_product_image_variants(product):
+    if update_image_variants(product):
+        bump_menu_version()
+
+
+def update_banner_image_variants(banner):
+    if update_image_variants(banner, BANNER_IMAGE_VARIANTS):
+        bump_banners_version()
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': str(product.price),
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'images': product.get_image_variants(),
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def get_catalog_products():
+    return Product.objects.select_related('category').available()
+
+
+def build_catalog_payload(pretty=False):
+    dumped_products = [serialize_product(product) for product in get_catalog_products()]
+    return dump_json(dumped_products, pretty=pretty)
+
+
+async def abuild_catalog_payload(pretty=False):
+    dumped_products = [serialize_product(product) async for product in get_catalog_products()]
+    return dump_json(dumped_products, pretty=pretty)
+
+
+def get_catalog_cache_key(version, pretty):
+    return CATALOG_KEY_TEMPLATE.format(
+        version=version,
+        variant='pretty' if pretty else 'compact',
+    )
+
+
+def get_catalog_payload(pretty=False):
+    """Return the encoded product list for the current menu version.
+
+    The payload is built once per menu version and shared between workers
+    through the Django cache, so a page load costs one cache read.
+    """
+    key = get_catalog_cache_key(get_menu_version(), pretty)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_catalog_payload(pretty=pretty)
+        cache.set(key, payload, timeout=CATALOG_TIMEOUT)
+    return payload
+
+
+def get_cached_catalog_payload():
+    """Return the compact product list if it is already cached, None otherwise."""
+    return cache.get(get_catalog_cache_key(get_menu_version(), pretty=False))
+
+
+async def aget_catalog_payload(version, pretty=False):
+    key = get_catalog_cache_key(version, pretty)
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await abuild_catalog_payload(pretty=pretty)
+        await cache.aset(key, payload, timeout=CATALOG_TIMEOUT)
+    return payload
+
+
+def make_catalog_etag(version, pretty=False):
+    suffix = '-pretty' if pretty else ''
+    return f'"menu-{version}{suffix}"'
+
+
+def get_catalog_etag(pretty=False):
+    return make_catalog_etag(get_menu_version(), pretty)
+
+
+def serialize_banner(banner):
+    return {
+        'title': banner.title,
+        'src': banner.image.url,
+        'text': banner.text,
+        'images': banner.get_image_variants(),
+    }
+
+
+def get_banners_expiration(now):
+    """Return the nearest moment a banner starts or stops being shown, or None."""
+    boundaries = Banner.objects.filter(is_active=True).aggregate(
+        next_start=Min('active_from', filter=Q(active_from__gt=now)),
+        next_end=Min('active_until', filter=Q(active_until__gt=now)),
+    )
+    moments = [moment for moment in boundaries.values() if moment is not None]
+    return min(moments, default=None)
+
+
+def build_banners_payload(pretty=False):
+    """Return the encoded active banners, their ETag and the moment they expire."""
+    now = timezone.now()
+    banners = [serialize_banner(banner) for banner in Banner.objects.active(now)]
+    payload = dump_json(banners, pretty=pretty)
+    etag = f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+    return payload, etag, get_banners_expiration(now)
+
+
+def get_banners_cache_key(version, pretty):
+    return BANNERS_KEY_TEMPLATE.format(
+        version=version,
+        variant='pretty' if pretty else 'compact',
+    )
+
+
+def get_banners_payload(pretty=False):
+    """Return the encoded active banners and their strong ETag.
+
+    The payload is cached until the banners are edited or the next
+    activity window of a banner opens or closes.
+    """
+    key = get_banners_cache_key(get_version(BANNERS_VERSION_KEY), pretty)
+    cached = cache.get(key)
+    if cached is None:
+        payload, etag, expires_at = build_banners_payload(pretty=pretty)
+        timeout = CATALOG_TIMEOUT
+        if expires_at is not None:
+            timeout = max(1, min(timeout, math.ceil((expires_at - timezone.now()).total_seconds())))
+        cached = payload, etag
+        cache.set(key, cached, timeout=timeout)
+    return cached
+
+
+def get_cached_banners_payload():
+    """Return the compact banners payload if it is already cached, None otherwise."""
+    cached = cache.get(get_banners_cache_key(get_version(BANNERS_VERSION_KEY), pretty=False))
+    return cached[0] if cached is not None else None
+
+
+async def aget_banners_payload(pretty=False):
+    key = get_banners_cache_key(await aget_version(BANNERS_VERSION_KEY), pretty)
+    cached = await cache.aget(key)
+    if cached is None:
+        cached = await sync_to_async(get_banners_payload)(pretty)
+    return cached
+
+
+class EligibilityIndex:
+    """Maps product ids to bitmasks of restaurants that have them on sale.
+
+    Bit ``i`` of a mask stands for ``restaurants[i]``, so restaurants able
+    to cook a whole cart are found by AND-ing the masks of its products.
+    """
+
+    def __init__(self, restaurants, product_masks):
+        self.restaurants = restaurants
+        self.product_masks = product_masks
+        self.all_restaurants_mask = (1 << len(restaurants)) - 1
+
+    def get_mask(self, product_ids):
+        if not product_ids:
+            return 0
+        mask = self.all_restaurants_mask
+        for product_id in product_ids:
+            mask &= self.product_masks.get(product_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def get_restaurants(self, product_ids):
+        mask = self.get_mask(product_ids)
+        restaurants = []
+        while mask:
+            lowest_bit = mask & -mask
+            restaurants.append(self.restaurants[lowest_bit.bit_length() - 1])
+            mask ^= lowest_bit
+        return restaurants
+
+
+def build_eligibility_index():
+    restaurants = list(Restaurant.objects.order_by('id'))
+    positions = {restaurant.id: position for position, restaurant in enumerate(restaurants)}
+
+    product_masks = {}
+    menu_items = (RestaurantMenuItem.objects
+                  .filter(availability=True)
+                  .values_list('product_id', 'restaurant_id'))
+    for product_id, restaurant_id in menu_items:
+        product_masks[product_id] = product_masks.get(product_id, 0) | 1 << positions[restaurant_id]
+
+    return EligibilityIndex(restaurants, product_masks)
+
+
+class VersionedMemo:
+    """Process-local copy of a value built for one menu version.
+
+    Threads of a process share the copy. It is reloaded by one of them
+    once a newer menu version shows up, the others wait for the result.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self.entry = None
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        entry = self.entry
+        if entry is not None and entry[0] >= version:
+            return entry[1]
+        with self.lock:
+            entry = self.entry
+            if entry is None or entry[0] < version:
+                entry = self.entry = (version, self.load(version))
+            return entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.entry = None
+
+
+def load_eligibility_index(version):
+    key = ELIGIBILITY_KEY_TEMPLATE.format(version=version)
+    index = cache.get(key)
+    if index is None:
+        index = build_eligibility_index()
+        cache.set(key, index, timeout=CATALOG_TIMEOUT)
+    return index
+
+
+eligibility_memo = VersionedMemo(load_eligibility_index)
+
+
+def get_eligibility_index():
+    """Return the eligibility index for the current menu version.
+
+    Costs one cache read of the menu version while the menu is unchanged.
+    """
+    return eligibility_memo.get(get_menu_version())
+
+
+def get_available_restaurants_from_index(order_ids):
+    products_by_order = defaultdict(set)
+    order_products = (OrderProduct.objects
+                      .filter(order_id__in=order_ids)
+                      .values_list('order_id', 'product_id'))
+    for order_id, product_id in order_products:
+        products_by_order[order_id].add(product_id)
+
+    eligibility_index = get_eligibility_index()
+    return {
+        order_id: eligibility_index.get_restaurants(product_ids)
+        for order_id, product_ids in products_by_order.items()
+    }
+
+
+def get_available_restaurants_from_db(order_ids):
+    """Find restaurants for orders with one grouped query.
+
+    An (order, restaurant) pair is kept when the number of cart lines the
+    restaurant has on sale equals the cart size.
+    """
+    cart_size = (OrderProduct.objects
+                 .filter(order=OuterRef('order'))
+                 .values('order')
+                 .annotate(count=Count('id'))
+                 .values('count'))
+    pairs = (OrderProduct.objects
+             .filter(order_id__in=order_ids, product__menu_items__availability=True)
+             .values('order_id', 'product__menu_items__restaurant_id')
+             .annotate(matched=Count('id'))
+             .filter(matched=Subquery(cart_size))
+             .values_list('order_id', 'product__menu_items__restaurant_id')
+             .order_by('order_id', 'product__menu_items__restaurant_id'))
+    pairs = list(pairs)
+
+    restaurants = Restaurant.objects.in_bulk({restaurant_id for _, restaurant_id in pairs})
+    restaurants_by_order = defaultdict(list)
+    for order_id, restaurant_id in pairs:
+        restaurants_by_order[order_id].append(restaurants[restaurant_id])
+    return restaurants_by_order
+
+
+ELIGIBILITY_BACKENDS = {
+    'python': get_available_restaurants_from_index,
+    'sql': get_available_restaurants_from_db,
+}
+
+
+def get_available_restaurants(order_ids):
+    """Return a dict of order id to the restaurants able to cook the order.
+
+    Orders without items are left out. The backend is chosen with the
+    ORDER_ELIGIBILITY_BACKEND setting.
+    """
+    backend = ELIGIBILITY_BACKENDS[settings.ORDER_ELIGIBILITY_BACKEND]
+    return backend(order_ids)
+
+
+DISTANCES_BATCH_SIZE = 500
+
+
+def save_distances_to_addresses(location, addresses):
+    counterparts = Location.objects.filter(
+        address__in=addresses,
+        lat__isnull=False,
+        lng__isnull=False,
+    )
+    save_distances(location, counterparts)
+
+
+def fill_location_distances(location):
+    """Store distances between a freshly geocoded location and its counterparts.
+
+    Only pairs the order board shows are stored: an order address is
+    matched with the restaurants able to cook its open orders, and a
+    restaurant address with the open orders it can cook. Open orders are
+    walked in batches of DISTANCES_BATCH_SIZE.
+    """
+    if location.lat is None or location.lng is None:
+        return
+
+    open_orders = Order.objects.exclude(status='completed')
+    order_ids = list(open_orders.filter(address=location.address).values_list('id', flat=True))
+    if order_ids:
+        restaurant_addresses = {
+            restaurant.address
+            for restaurants in get_available_restaurants(order_ids).values()
+            for restaurant in restaurants
+        }
+        save_distances_to_addresses(location, restaurant_addresses)
+
+    restaurant_ids = set(Restaurant.objects.filter(address=location.address).values_list('id', flat=True))
+    if not restaurant_ids:
+        return
+    orders = list(open_orders.order_by('id').values_list('id', 'address'))
+    for start in range(0, len(orders), DISTANCES_BATCH_SIZE):
+        batch = orders[start:start + DISTANCES_BATCH_SIZE]
+        restaurants_by_order = get_available_restaurants([order_id for order_id, _ in batch])
+        order_addresses = {
+            address
+            for order_id, address in batch
+            if any(restaurant.id in restaurant_ids for restaurant in restaurants_by_order.get(order_id, []))
+        }
+        if order_addresses:
+            save_distances_to_addresses(location, order_addresses)
+
+
+def prune_distances():
+    """Delete stored distances that no open order needs any more.
+
+    Returns the number of deleted rows.
+    """
+    open_addresses = Order.objects.exclude(status='completed').values('address')
+    deleted, _ = (
+        Distance.objects
+        .exclude(location_from__address__in=open_addresses)
+        .exclude(location_to__address__in=open_addresses)
+        .delete()
+    )
+    return deleted
+
+
+def build_restaurants_grid():
+    restaurants = list(Restaurant.objects.order_by('id'))
+    coordinates = get_addresses_coordinates(restaurant.address for restaurant in restaurants)
+    return SpatialGrid(
+        (restaurant, *coordinates[restaurant.address])
+        for restaurant in restaurants
+        if coordinates.get(restaurant.address)
+    )
+
+
+def get_restaurants_grid():
+    """Return a spatial index of geocoded restaurants.
+
+    The grid has its own version: it depends on restaurants and their
+    coordinates only, so menu edits do not rebuild it.
+    """
+    key = RESTAURANTS_GRID_KEY_TEMPLATE.format(version=get_version(RESTAURANTS_GRID_VERSION_KEY))
+    grid = cache.get(key)
+    if grid is None:
+        grid = build_restaurants_grid()
+        cache.set(key, grid, timeout=CATALOG_TIMEOUT)
+    return grid
+
+
+def get_nearest_restaurants(address, count):
+    """Return up to `count` (restaurant, distance in km) pairs nearest to the address."""
+    coordinates = get_coordinates(address)
+    if not coordinates:
+        return []
+    return get_restaurants_grid().nearest(*coordinates, count)
+
+
+def get_restaurants_within(address, radius_km):
+    """Return (restaurant, distance in km) pairs closer than `radius_km` to the address."""
+    coordinates = get_coordinates(address)
+    if not coordinates:
+        return []
+    return get_restaurants_grid().within(*coordinates, radius_km)
+
+
+def get_request_fingerprint(data):
+    encoded_data = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded_data.encode('utf-8')).hexdigest()
+
+
+def claim_idempotency_key(key, fingerprint):
+    """Return the IdempotencyKey record and whether this call created it.
+
+    Relies on the unique index: a concurrent request with the same key
+    waits for the first transaction and then finds its stored response.
+    Expired keys are removed and can be claimed again.
+    """
+    expired_before = timezone.now() - datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    IdempotencyKey.objects.filter(key=key, created_at__lt=expired_before).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(key=key, fingerprint=fingerprint), True
+    except IntegrityError:
+        return IdempotencyKey.objects.get(key=key), False
+
+
+def build_order(order_data):
+    items = [
+        OrderProduct(
+            product=item['product'],
+            quantity=item['quantity'],
+            final_price=item['product'].price,
+        )
+        for item in order_data['products']
+    ]
+    order = Order(
+        firstname=order_data['firstname'],
+        lastname=order_data['lastname'],
+        phonenumber=order_data['phonenumber'],
+        address=order_data['address'],
+        total=sum(item.final_price * item.quantity for item in items),
+    )
+    return order, items
+
+
+def create_orders(orders_data):
+    """Create orders from validated OrderSerializer data with two bulk inserts."""
+    built_orders = [build_order(order_data) for order_data in orders_data]
+    orders = Order.objects.bulk_create([order for order, _ in built_orders])
+
+    order_items = []
+    for order, items in built_orders:
+        for item in items:
+            item.order = order
+        order_items.extend(items)
+    OrderProduct.objects.bulk_create(order_items)
+
+    enqueue_geocoding(*(order.address for order in orders))
+    return orders
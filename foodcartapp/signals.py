@@ -0,0 +1,72 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from foodcartapp.models import Banner, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from foodcartapp.services import bump_menu_version, fill_location_distances
+from foodcartapp.services import bump_banners_version, bump_restaurants_grid_version
+from foodcartapp.services import update_banner_image_variants, update_product_image_variants
+from geolocations.models import Location
+from geolocations.services import enqueue_geocoding
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def invalidate_menu(sender, **kwargs):
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_banners(sender, **kwargs):
+    transaction.on_commit(bump_banners_version)
+
+
+@receiver(pre_save, sender=Product)
+@receiver(pre_save, sender=Banner)
+def reset_image_hash(sender, instance, **kwargs):
+    if instance.image and not instance.image._committed:
+        instance.image_hash = ''
+
+
+@receiver(post_save, sender=Product)
+def generate_product_image_variants(sender, instance, **kwargs):
+    if instance.image and not instance.image_hash:
+        transaction.on_commit(partial(update_product_image_variants, instance))
+
+
+@receiver(post_save, sender=Banner)
+def generate_banner_image_variants(sender, instance, **kwargs):
+    if instance.image and not instance.image_hash:
+        transaction.on_commit(partial(update_banner_image_variants, instance))
+
+
+@receiver(post_save, sender=Restaurant)
+def geocode_restaurant_address(sender, instance, **kwargs):
+    enqueue_geocoding(instance.address)
+
+
+@receiver(post_save, sender=Location)
+def fill_distances(sender, instance, **kwargs):
+    transaction.on_commit(partial(fill_location_distances, instance))
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurants_grid(sender, **kwargs):
+    transaction.on_commit(bump_restaurants_grid_version)
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_restaurants_grid_location(sender, instance, **kwargs):
+    if Restaurant.objects.filter(address=instance.address).exists():
+        transaction.on_commit(bump_restaurants_grid_version)
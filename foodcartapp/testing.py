@@ -0,0 +1,39 @@
+"""Fixtures shared by the tests of foodcartapp and restaurateur."""
+
+from foodcartapp.models import Order, OrderProduct, Product, Restaurant
+
+
+CUSTOMER = {
+    'firstname': 'Иван',
+    'lastname': 'Иванов',
+    'phonenumber': '+79001234567',
+    'address': 'Москва, Тверская 1',
+}
+
+
+def create_products(numbers):
+    return [
+        Product.objects.create(name=f'Продукт {number}', price=100, image='product.jpg')
+        for number in numbers
+    ]
+
+
+def create_restaurants(numbers):
+    return [
+        Restaurant.objects.create(name=f'Ресторан {number}', address=f'Адрес {number}')
+        for number in numbers
+    ]
+
+
+def make_order_payload(products):
+    """Order as the storefront posts it to the API."""
+    return {**CUSTOMER, 'products': products}
+
+
+def create_order(products=(), quantity=1, **fields):
+    """Create an order of the given products with a matching total."""
+    order = Order.objects.create(**{**CUSTOMER, **fields})
+    for product in products:
+        OrderProduct.objects.create(order=order, product=product, quantity=quantity, final_price=product.price)
+    order.update_total()
+    return order
@@ -0,0 +1,769 @@
+import datetime
+import gzip
+import io
+import json
+import re
+import tempfile
+from unittest import mock
+
+import brotli
+from asgiref.sync import async_to_sync
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+
+from foodcartapp.images import IMAGE_VARIANTS, get_variant_name
+from foodcartapp.models import Banner, Order, OrderProduct, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from foodcartapp.paginators import EstimatedCountPaginator
+from foodcartapp.services import bump_menu_version, get_eligibility_index
+from foodcartapp.services import get_nearest_restaurants, get_restaurants_within
+from foodcartapp.testing import create_order, create_products, create_restaurants, make_order_payload
+from foodcartapp.throttling import OrdersBatchThrottle
+from foodcartapp.views import abanners_list_api, aproduct_list_api, banners_list_api, product_list_api
+from geolocations.models import Distance, Location
+from star_burger.storage import CompressedManifestStaticFilesStorage
+
+
+class RegisterOrderTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(range(100))
+
+    def register_order(self, order, **headers):
+        return self.client.post('/api/order/', order, content_type='application/json', headers=headers)
+
+    def test_products_are_loaded_with_one_query(self):
+        queries_count = set()
+        for cart_size in [1, 10, 100]:
+            order = make_order_payload([
+                {'product': product.id, 'quantity': 1}
+                for product in self.products[:cart_size]
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                response = self.register_order(order)
+
+            self.assertEqual(response.status_code, 200)
+            product_queries = [
+                query for query in queries
+                if query['sql'].startswith('SELECT') and 'FROM "foodcartapp_product"' in query['sql']
+            ]
+            self.assertEqual(len(product_queries), 1)
+            queries_count.add(len(queries))
+
+        self.assertEqual(len(queries_count), 1)
+
+    def test_invalid_products_keep_error_structure(self):
+        response = self.register_order(make_order_payload([
+            {'product': self.products[0].id, 'quantity': 1},
+            {'product': 0, 'quantity': 1},
+            {'product': 'бургер', 'quantity': 1},
+            {'product': True, 'quantity': 1},
+        ]))
+
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['products']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1], {'product': ['Недопустимый первичный ключ "0" - объект не существует.']})
+        self.assertEqual(errors[2], {'product': ['Некорректный тип. Ожидалось значение первичного ключа, получен str.']})
+        self.assertEqual(errors[3], {'product': ['Некорректный тип. Ожидалось значение первичного ключа, получен bool.']})
+        self.assertFalse(Order.objects.exists())
+
+    def test_too_long_address_is_rejected(self):
+        order = make_order_payload([{'product': self.products[0].id, 'quantity': 1}])
+        order['address'] = 'Москва, ' + 'очень длинная улица ' * 20
+
+        response = self.register_order(order)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('address', response.json())
+        self.assertFalse(Order.objects.exists())
+
+    def test_replayed_order_is_not_created_twice(self):
+        order = make_order_payload([{'product': self.products[0].id, 'quantity': 2}])
+
+        response = self.register_order(order, idempotency_key='checkout-1')
+        with CaptureQueriesContext(connection) as queries:
+            replayed_response = self.register_order(order, idempotency_key='checkout-1')
+
+        self.assertEqual(replayed_response.status_code, 200)
+        self.assertEqual(replayed_response.json(), response.json())
+        self.assertEqual(replayed_response.headers['Idempotent-Replayed'], 'true')
+        self.assertFalse(any('INSERT INTO "foodcartapp_order"' in query['sql'] for query in queries))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_reused_key_with_other_order_is_rejected(self):
+        self.register_order(
+            make_order_payload([{'product': self.products[0].id, 'quantity': 2}]),
+            idempotency_key='checkout-1',
+        )
+
+        response = self.register_order(
+            make_order_payload([{'product': self.products[1].id, 'quantity': 2}]),
+            idempotency_key='checkout-1',
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class RegisterOrdersBatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(range(3))
+        cls.partner = User.objects.create_user('partner')
+        cls.token = Token.objects.create(user=cls.partner)
+
+    def setUp(self):
+        cache.clear()
+
+    def post_batch(self, orders, **headers):
+        return self.client.post(
+            '/api/order/batch/',
+            orders,
+            content_type='application/json',
+            headers={'Authorization': f'Token {self.token.key}', **headers},
+        )
+
+    def test_valid_orders_are_created_and_errors_reported(self):
+        orders = [
+            make_order_payload([{'product': self.products[0].id, 'quantity': 1}]),
+            make_order_payload([{'product': 0, 'quantity': 1}]),
+            make_order_payload([
+                {'product': self.products[1].id, 'quantity': 2},
+                {'product': self.products[2].id, 'quantity': 1},
+            ]),
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_batch(orders)
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result['created'], result['failed']), (2, 1))
+        self.assertEqual([item['index'] for item in result['results']], [0, 1, 2])
+        self.assertIn('errors', result['results'][1])
+        self.assertEqual(
+            sorted(Order.objects.values_list('total', flat=True)),
+            [100, 300],
+        )
+        self.assertEqual(OrderProduct.objects.count(), 3)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "foodcartapp_order')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_non_list_payload_is_rejected(self):
+        response = self.post_batch(make_order_payload([]))
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_anonymous_requests_are_rejected(self):
+        orders = [make_order_payload([{'product': self.products[0].id, 'quantity': 1}])]
+
+        for headers in [{}, {'Authorization': 'Token wrong'}]:
+            response = self.client.post('/api/order/batch/', orders, content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 401)
+        self.assertFalse(Order.objects.exists())
+
+    @mock.patch.object(OrdersBatchThrottle, 'THROTTLE_RATES', {'orders_batch': '1/hour'})
+    def test_partner_is_throttled(self):
+        orders = [make_order_payload([{'product': self.products[0].id, 'quantity': 1}])]
+
+        self.assertEqual(self.post_batch(orders).status_code, 200)
+        self.assertEqual(self.post_batch(orders).status_code, 429)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class AsyncProductListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва, Тверская 1')
+        product = Product.objects.create(name='Бургер', price=100, image='product.jpg')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+        self.factory = RequestFactory()
+
+    def test_async_view_matches_sync_view(self):
+        request = self.factory.get('/api/products/')
+        sync_response = product_list_api(request)
+        async_response = async_to_sync(aproduct_list_api)(request)
+
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(json.loads(async_response.content), json.loads(sync_response.content))
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+        self.assertEqual(async_response['Last-Modified'], sync_response['Last-Modified'])
+
+    def test_async_view_answers_not_modified(self):
+        response = async_to_sync(aproduct_list_api)(self.factory.get('/api/products/'))
+
+        request = self.factory.get('/api/products/', headers={'If-None-Match': response['ETag']})
+        with self.assertNumQueries(0):
+            response = async_to_sync(aproduct_list_api)(request)
+        self.assertEqual(response.status_code, 304)
+
+
+class ProductListTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ProductCategory.objects.create(name='Бургеры')
+        self.restaurant = Restaurant.objects.create(name='Ресторан', address='Москва, Тверская 1')
+        self.product = Product.objects.create(
+            name='Бургер',
+            price=100,
+            image='product.jpg',
+            category=self.category,
+        )
+        self.menu_item = RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.product)
+        self.factory = RequestFactory()
+
+    def get_products(self, **headers):
+        return product_list_api(self.factory.get('/api/products/', headers=headers))
+
+    def test_warm_cache_runs_no_queries(self):
+        self.get_products()
+
+        with self.assertNumQueries(0):
+            response = self.get_products()
+        self.assertEqual([product['name'] for product in json.loads(response.content)], ['Бургер'])
+
+    def test_edits_are_served_after_commit(self):
+        def rename_product():
+            self.product.name = 'Чизбургер'
+            self.product.save()
+
+        def rename_category():
+            self.category.name = 'Сэндвичи'
+            self.category.save()
+
+        def hide_menu_item():
+            self.menu_item.availability = False
+            self.menu_item.save()
+
+        edits = [
+            (rename_product, lambda products: products[0]['name'] == 'Чизбургер'),
+            (rename_category, lambda products: products[0]['category']['name'] == 'Сэндвичи'),
+            (hide_menu_item, lambda products: products == []),
+        ]
+        for edit, is_updated in edits:
+            with self.subTest(edit.__name__):
+                self.get_products()
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    edit()
+
+                self.assertTrue(is_updated(json.loads(self.get_products().content)))
+
+    def test_matching_etag_answers_not_modified(self):
+        etag = self.get_products()['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.get_products(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_last_modified_answers_not_modified(self):
+        last_modified = self.get_products()['Last-Modified']
+
+        response = self.get_products(if_modified_since=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        earlier = http_date(parse_http_date(last_modified) - 1)
+        response = self.get_products(if_modified_since=earlier)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pretty_output_has_own_etag(self):
+        compact = self.get_products()
+        pretty = product_list_api(self.factory.get('/api/products/', {'pretty': '1'}))
+
+        self.assertNotEqual(pretty.content, compact.content)
+        self.assertEqual(json.loads(pretty.content), json.loads(compact.content))
+        self.assertIn(b'\n    ', pretty.content)
+        self.assertNotEqual(pretty['ETag'], compact['ETag'])
+
+        request = self.factory.get('/api/products/', {'pretty': '1'}, headers={'If-None-Match': compact['ETag']})
+        self.assertEqual(product_list_api(request).status_code, 200)
+
+
+class EligibilityIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = create_products(range(10))
+        cls.restaurants = Restaurant.objects.bulk_create(
+            Restaurant(name=f'Ресторан {number}', address=f'Адрес {number}')
+            for number in range(500)
+        )
+        RestaurantMenuItem.objects.bulk_create(
+            RestaurantMenuItem(
+                restaurant=restaurant,
+                product=product,
+                availability=(restaurant_number + product_number) % 7 != 0,
+            )
+            for restaurant_number, restaurant in enumerate(cls.restaurants)
+            for product_number, product in enumerate(cls.products)
+            if (restaurant_number * 3 + product_number) % 4
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get_expected_restaurant_ids(self, products):
+        restaurants = Restaurant.objects.order_by('id')
+        for product in products:
+            restaurants = restaurants.filter(menu_items__product=product, menu_items__availability=True)
+        return list(restaurants.values_list('id', flat=True))
+
+    def test_index_matches_database_for_many_restaurants(self):
+        index = get_eligibility_index()
+
+        carts = [self.products[:1], self.products[1:3], self.products[2:5], self.products[5:8]]
+        for cart in carts:
+            with self.subTest(cart=[product.name for product in cart]):
+                expected_ids = self.get_expected_restaurant_ids(cart)
+                self.assertTrue(expected_ids)
+                self.assertEqual(
+                    [restaurant.id for restaurant in index.get_restaurants({product.id for product in cart})],
+                    expected_ids,
+                )
+
+    def test_warm_index_costs_no_queries(self):
+        get_eligibility_index()
+
+        with self.assertNumQueries(0):
+            index = get_eligibility_index()
+        self.assertEqual(len(index.restaurants), 500)
+
+
+class OrderAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='password')
+        cls.product = Product.objects.create(name='Бургер', price=100, image='product.jpg')
+        cls.restaurant = Restaurant.objects.create(name='Ресторан', address='Москва, Тверская 1')
+        RestaurantMenuItem.objects.create(restaurant=cls.restaurant, product=cls.product)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_orders(self, count):
+        for number in range(count):
+            create_order([self.product])
+
+    def count_changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/foodcartapp/order/')
+        self.assertContains(response, 'Ресторан')
+        return len(queries)
+
+    def test_changelist_queries_do_not_depend_on_orders_count(self):
+        self.create_orders(2)
+        self.count_changelist_queries()
+        few_orders_queries = self.count_changelist_queries()
+
+        self.create_orders(20)
+        self.assertEqual(self.count_changelist_queries(), few_orders_queries)
+
+    def test_menu_is_read_once_per_version(self):
+        self.create_orders(2)
+        self.count_changelist_queries()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/admin/foodcartapp/order/')
+        self.assertFalse([query for query in queries if 'foodcartapp_restaurantmenuitem' in query['sql']])
+
+        bump_menu_version()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/admin/foodcartapp/order/')
+        self.assertTrue([query for query in queries if 'foodcartapp_restaurantmenuitem' in query['sql']])
+
+    def test_inline_edits_recompute_total(self):
+        order = create_order([self.product])
+        item = order.items.get()
+        registrated_at = timezone.localtime(order.registrated_at)
+
+        response = self.client.post(f'/admin/foodcartapp/order/{order.id}/change/', {
+            'firstname': order.firstname,
+            'lastname': order.lastname,
+            'phonenumber': order.phonenumber,
+            'address': order.address,
+            'status': order.status,
+            'registrated_at_0': registrated_at.strftime('%Y-%m-%d'),
+            'registrated_at_1': registrated_at.strftime('%H:%M:%S'),
+            'items-TOTAL_FORMS': '1',
+            'items-INITIAL_FORMS': '1',
+            'items-0-id': item.id,
+            'items-0-order': order.id,
+            'items-0-product': self.product.id,
+            'items-0-quantity': '3',
+            'items-0-final_price': '90',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertEqual(order.total, 270)
+
+    def test_eligibility_index_is_fetched_once_per_changelist(self):
+        self.create_orders(5)
+
+        with mock.patch('foodcartapp.admin.get_eligibility_index', wraps=get_eligibility_index) as get_index:
+            self.count_changelist_queries()
+
+        self.assertEqual(get_index.call_count, 1)
+
+    def test_search_by_exact_phonenumber_and_name(self):
+        self.create_orders(1)
+
+        response = self.client.get('/admin/foodcartapp/order/', {'q': '+79001234567'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get('/admin/foodcartapp/order/', {'q': 'Иван'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get('/admin/foodcartapp/order/', {'q': '+7900'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_search_by_local_phonenumber(self):
+        self.create_orders(1)
+
+        for search_term in ['89001234567', '8 (900) 123-45-67', '+7 900 123 45 67']:
+            response = self.client.get('/admin/foodcartapp/order/', {'q': search_term})
+            self.assertEqual(response.context['cl'].result_count, 1, search_term)
+
+    def test_phonenumber_search_does_not_match_names(self):
+        self.create_orders(1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/admin/foodcartapp/order/', {'q': '89001234567'})
+        search_queries = [query['sql'] for query in queries if '"foodcartapp_order"."phonenumber" =' in query['sql']]
+        self.assertTrue(search_queries)
+        self.assertFalse([sql for sql in search_queries if 'LIKE' in sql])
+
+
+class RepairOrderTotalsCommandTest(TestCase):
+    def setUp(self):
+        product = Product.objects.create(name='Бургер', price=100, image='product.jpg')
+        self.orders = [create_order([product], quantity=quantity) for quantity in range(1, 4)]
+        Order.objects.filter(id__in=[self.orders[0].id, self.orders[2].id]).update(total=1)
+
+    def get_totals(self):
+        return list(Order.objects.order_by('id').values_list('total', flat=True))
+
+    def test_drifted_totals_are_repaired(self):
+        stdout = io.StringIO()
+
+        call_command('repair_order_totals', batch_size=1, stdout=stdout)
+
+        self.assertIn('Заказов с неверной стоимостью: 2', stdout.getvalue())
+        self.assertEqual(self.get_totals(), [100, 200, 300])
+
+    def test_dry_run_changes_nothing(self):
+        stdout = io.StringIO()
+
+        call_command('repair_order_totals', dry_run=True, stdout=stdout)
+
+        self.assertIn('Заказов с неверной стоимостью: 2', stdout.getvalue())
+        self.assertEqual(self.get_totals(), [1, 200, 1])
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([
+            Product(name=f'Продукт {number}', price=number, image='product.jpg')
+            for number in range(5)
+        ])
+
+    @mock.patch.object(EstimatedCountPaginator, 'get_estimated_count', return_value=10 ** 6)
+    def test_estimate_is_used_for_unfiltered_lists(self, get_estimated_count):
+        paginator = EstimatedCountPaginator(Product.objects.order_by('id'), 2)
+
+        self.assertEqual(paginator.count, 10 ** 6)
+
+    @mock.patch.object(EstimatedCountPaginator, 'get_estimated_count', return_value=10 ** 6)
+    def test_filtered_lists_are_counted_exactly(self, get_estimated_count):
+        paginator = EstimatedCountPaginator(Product.objects.filter(price__gt=1).order_by('id'), 2)
+
+        self.assertEqual(paginator.count, 3)
+        get_estimated_count.assert_not_called()
+
+    @mock.patch.object(EstimatedCountPaginator, 'get_estimated_count', return_value=10)
+    def test_small_tables_are_counted_exactly(self, get_estimated_count):
+        paginator = EstimatedCountPaginator(Product.objects.order_by('id'), 2)
+
+        self.assertEqual(paginator.count, 5)
+
+
+class ProductImageVariantsTest(TestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def make_image(self, name, size=(1200, 600), mode='RGBA'):
+        content = io.BytesIO()
+        Image.new(mode, size, 'red').save(content, format='PNG')
+        return SimpleUploadedFile(name, content.getvalue())
+
+    def test_variants_are_generated_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Бургер', price=100, image=self.make_image('burger.png'))
+
+        product.refresh_from_db()
+        self.assertEqual(len(product.image_hash), 64)
+        variants = product.get_image_variants()
+        for variant, size in IMAGE_VARIANTS.items():
+            for url in variants[variant].values():
+                self.assertIn(product.image_hash, url)
+            with default_storage.open(get_variant_name(product.image_hash, variant, '.webp')) as file:
+                self.assertEqual(Image.open(file).size, (size[0], size[0] // 2))
+
+    def test_replaced_image_gets_new_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Бургер', price=100, image=self.make_image('burger.png'))
+        old_hash = Product.objects.get().image_hash
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.make_image('burger.png', size=(300, 300))
+            product.save()
+
+        self.assertNotIn(Product.objects.get().image_hash, ['', old_hash])
+
+    def test_command_backfills_missing_variants(self):
+        product = Product.objects.create(name='Бургер', price=100, image=self.make_image('burger.png'))
+
+        call_command('generate_image_variants', processes=1, stdout=io.StringIO(), stderr=io.StringIO())
+
+        product.refresh_from_db()
+        self.assertTrue(product.image_hash)
+        self.assertTrue(default_storage.exists(get_variant_name(product.image_hash, 'thumb', '.png')))
+
+
+class CompressedManifestStaticFilesStorageTest(SimpleTestCase):
+    def test_hashed_files_get_compressed_siblings(self):
+        static_root = self.enterContext(tempfile.TemporaryDirectory())
+        storage = CompressedManifestStaticFilesStorage(location=static_root, base_url='/static/')
+        script = b'console.log("star burger");\n' * 100
+        storage.save('index.js', ContentFile(script))
+        storage.save('icon.png', ContentFile(b'\x89PNG' + bytes(range(256))))
+
+        list(storage.post_process({name: (storage, name) for name in ['index.js', 'icon.png']}))
+
+        hashed_name = storage.stored_name('index.js')
+        self.assertNotEqual(hashed_name, 'index.js')
+        for name in ['index.js', hashed_name]:
+            with storage.open(f'{name}.gz') as file:
+                self.assertEqual(gzip.decompress(file.read()), script)
+            with storage.open(f'{name}.br') as file:
+                self.assertEqual(brotli.decompress(file.read()), script)
+        self.assertFalse(storage.exists('icon.png.gz'))
+
+
+class StartPageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        restaurant = Restaurant.objects.create(name='Ресторан', address='Москва, Тверская 1')
+        product = Product.objects.create(name='Бургер </script>', price=100, image='product.jpg')
+        RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+
+    def test_data_is_inlined_only_when_cached(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertNotContains(response, 'id="catalog-data"')
+        self.assertNotContains(response, 'id="banners-data"')
+
+        catalog = self.client.get('/api/products/').json()
+        banners = self.client.get('/api/banners/').json()
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+
+        self.assertNotContains(response, 'Бургер </script>')
+        inlined = re.search(r'<script id="catalog-data" type="application/json">(.*?)</script>', response.text)
+        self.assertEqual(json.loads(inlined.group(1)), catalog)
+        inlined = re.search(r'<script id="banners-data" type="application/json">(.*?)</script>', response.text)
+        self.assertEqual(json.loads(inlined.group(1)), banners)
+
+    @override_settings(INLINE_STOREFRONT_DATA=False)
+    def test_inlining_can_be_disabled(self):
+        self.client.get('/api/products/')
+
+        response = self.client.get('/')
+
+        self.assertNotContains(response, 'application/json')
+
+
+class BannersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_banner(self, title, **kwargs):
+        return Banner.objects.create(title=title, image='banners/banner.jpg', **kwargs)
+
+    def get_titles(self):
+        return [banner['title'] for banner in self.client.get('/api/banners/').json()]
+
+    def test_only_active_banners_are_shown_in_order(self):
+        now = timezone.now()
+        self.create_banner('Второй', order=2)
+        self.create_banner('Первый', order=1)
+        self.create_banner('Скрытый', is_active=False)
+        self.create_banner('Будущий', active_from=now + datetime.timedelta(days=1))
+        self.create_banner('Прошедший', active_until=now - datetime.timedelta(days=1))
+
+        self.assertEqual(self.get_titles(), ['Первый', 'Второй'])
+
+    def test_payload_is_served_from_cache(self):
+        self.create_banner('Первый')
+        self.client.get('/api/banners/')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_titles(), ['Первый'])
+
+    def test_edits_invalidate_payload(self):
+        banner = self.create_banner('Первый')
+        self.get_titles()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            banner.title = 'Новый'
+            banner.save()
+
+        self.assertEqual(self.get_titles(), ['Новый'])
+
+    def test_payload_expires_with_activity_window(self):
+        self.create_banner('Акция', active_from=timezone.now() + datetime.timedelta(minutes=5))
+
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.assertEqual(self.get_titles(), [])
+
+        self.assertLessEqual(cache_set.call_args.kwargs['timeout'], 5 * 60)
+
+    def test_async_view_matches_sync_view(self):
+        self.create_banner('Первый')
+        request = RequestFactory().get('/api/banners/')
+
+        sync_response = banners_list_api(request)
+        async_response = async_to_sync(abanners_list_api)(request)
+
+        self.assertEqual(async_response.content, sync_response.content)
+        self.assertEqual(async_response['ETag'], sync_response['ETag'])
+
+
+class RestaurantsGridTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.near = self.create_restaurant('Ближний', 'Москва, Тверская 1', 55.757, 37.613)
+        self.far = self.create_restaurant('Дальний', 'Москва, Профсоюзная 100', 55.640, 37.520)
+        Location.objects.create(address='Москва, Пушкинская площадь', lat=55.765, lng=37.606)
+
+    def create_restaurant(self, name, address, lat, lng):
+        Location.objects.create(address=address, lat=lat, lng=lng)
+        return Restaurant.objects.create(name=name, address=address)
+
+    def get_names(self, restaurants):
+        return [restaurant.name for restaurant, distance in restaurants]
+
+    def test_nearest_restaurants_are_ranked_by_distance(self):
+        restaurants = get_nearest_restaurants('Москва, Пушкинская площадь', 2)
+
+        self.assertEqual(self.get_names(restaurants), ['Ближний', 'Дальний'])
+        self.assertLess(restaurants[0][1], 2)
+
+    def test_restaurants_within_radius(self):
+        self.assertEqual(self.get_names(get_restaurants_within('Москва, Пушкинская площадь', 5)), ['Ближний'])
+
+    def test_unknown_address_has_no_restaurants(self):
+        self.assertEqual(get_nearest_restaurants('Москва, Неизвестная 1', 2), [])
+        self.assertEqual(get_restaurants_within('Москва, Неизвестная 1', 5), [])
+
+    def test_menu_edits_keep_grid(self):
+        get_nearest_restaurants('Москва, Пушкинская площадь', 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Бургер', price=100)
+
+        with self.assertNumQueries(0):
+            get_nearest_restaurants('Москва, Пушкинская площадь', 2)
+
+    def test_restaurant_location_edits_rebuild_grid(self):
+        get_nearest_restaurants('Москва, Пушкинская площадь', 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.get(address=self.far.address)
+            location.lat, location.lng = 55.766, 37.607
+            location.save()
+
+        restaurants = get_nearest_restaurants('Москва, Пушкинская площадь', 2)
+        self.assertEqual(self.get_names(restaurants), ['Дальний', 'Ближний'])
+
+
+class FillBannersCommandTest(TestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_default_banners_are_created_once(self):
+        call_command('fill_banners', stdout=io.StringIO())
+
+        banners = list(Banner.objects.order_by('order'))
+        self.assertEqual([banner.title for banner in banners], ['Burger', 'Spices', 'New York'])
+        for banner in banners:
+            self.assertTrue(default_storage.exists(banner.image.name))
+
+        call_command('fill_banners', stdout=io.StringIO())
+        self.assertEqual(Banner.objects.count(), 3)
+
+
+class LocationDistancesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        burger, salad = create_products(range(2))
+        self.burger_restaurant, self.salad_restaurant = create_restaurants(range(2))
+        RestaurantMenuItem.objects.create(restaurant=self.burger_restaurant, product=burger)
+        RestaurantMenuItem.objects.create(restaurant=self.salad_restaurant, product=salad)
+        self.order = create_order([burger])
+
+    def create_location(self, address, lat, lng):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Location.objects.create(address=address, lat=lat, lng=lng)
+
+    def get_stored_pairs(self):
+        return {
+            frozenset([location_from, location_to])
+            for location_from, location_to in Distance.objects.values_list(
+                'location_from__address',
+                'location_to__address',
+            )
+        }
+
+    def test_order_address_is_matched_with_eligible_restaurants_only(self):
+        self.create_location(self.burger_restaurant.address, 55.757, 37.613)
+        self.create_location(self.salad_restaurant.address, 55.751, 37.598)
+        self.assertEqual(self.get_stored_pairs(), set())
+
+        self.create_location(self.order.address, 55.765, 37.606)
+
+        self.assertEqual(self.get_stored_pairs(), {frozenset([self.order.address, self.burger_restaurant.address])})
+
+    def test_restaurant_address_is_matched_with_orders_it_can_cook(self):
+        self.create_location(self.order.address, 55.765, 37.606)
+
+        self.create_location(self.salad_restaurant.address, 55.751, 37.598)
+        self.assertEqual(self.get_stored_pairs(), set())
+
+        self.create_location(self.burger_restaurant.address, 55.757, 37.613)
+        self.assertEqual(self.get_stored_pairs(), {frozenset([self.order.address, self.burger_restaurant.address])})
+
+    def test_distances_of_finished_orders_are_purged(self):
+        self.create_location(self.burger_restaurant.address, 55.757, 37.613)
+        self.create_location(self.order.address, 55.765, 37.606)
+        stdout = io.StringIO()
+
+        call_command('purge_distances', stdout=stdout)
+        self.assertTrue(Distance.objects.exists())
+
+        Order.objects.filter(id=self.order.id).update(status='completed')
+        call_command('purge_distances', stdout=stdout)
+        self.assertFalse(Distance.objects.exists())
+        self.assertIn('Удалено расстояний: 1', stdout.getvalue())
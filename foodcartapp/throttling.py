@@ -0,0 +1,7 @@
+from rest_framework.throttling import UserRateThrottle
+
+
+class OrdersBatchThrottle(UserRateThrottle):
+    """Limits how often one partner may post order batches."""
+
+    scope = 'orders_batch'
@@ -1,12 +1,16 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import product_list_api, banners_list_api, register_order
+from .views import aproduct_list_api, abanners_list_api
+from .views import register_orders_batch
 
 
 app_name = "foodcartapp"
 
 urlpatterns = [
-    path('products/', product_list_api),
-    path('banners/', banners_list_api),
+    path('products/', aproduct_list_api if settings.ASYNC_API else product_list_api),
+    path('banners/', abanners_list_api if settings.ASYNC_API else banners_list_api),
     path('order/', register_order),
+    path('order/batch/', register_orders_batch),
 ]
@@ -1,89 +1,157 @@
+from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse
-from django.templatetags.static import static
-from rest_framework.decorators import api_view
+from django.http import HttpResponse
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Product, Order, OrderProduct, Restaurant
-from .serializers import OrderSerializer
+from .models import IdempotencyKey
+from .serializers import OrderSerializer, preload_order_products
+from .throttling import OrdersBatchThrottle
+from .services import get_banners_payload, get_catalog_etag
+from .services import aget_banners_payload
+from .services import get_catalog_payload, get_menu_modified_at
+from .services import aget_catalog_payload, aget_menu_version, make_catalog_etag
+from .services import claim_idempotency_key, get_request_fingerprint
+from .services import create_orders
+from .services import is_pretty_requested
+from .services import embed_json, get_cached_banners_payload, get_cached_catalog_payload
 
 
+def start_page(request):
+    """Render the storefront with the catalog and banners inlined.
+
+    Each block is inlined only when it is already cached, so the page is
+    never slowed down by building it; the frontend fetches what is missing.
+    """
+    context = {}
+    if settings.INLINE_STOREFRONT_DATA:
+        banners_payload = get_cached_banners_payload()
+        if banners_payload is not None:
+            context['banners_json'] = embed_json(banners_payload)
+        catalog_payload = get_cached_catalog_payload()
+        if catalog_payload is not None:
+            context['catalog_json'] = embed_json(catalog_payload)
+    return render(request, 'index.html', context=context)
+
+
+@cache_control(public=True, no_cache=True)
+@condition(etag_func=lambda request: get_banners_payload(is_pretty_requested(request))[1])
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    payload, _ = get_banners_payload(is_pretty_requested(request))
+    return HttpResponse(payload, content_type='application/json')
 
 
+@cache_control(public=True, no_cache=True)
+@condition(
+    etag_func=lambda request: get_catalog_etag(is_pretty_requested(request)),
+    last_modified_func=lambda request: get_menu_modified_at(),
+)
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    payload = get_catalog_payload(is_pretty_requested(request))
+    return HttpResponse(payload, content_type='application/json')
+
+
+@cache_control(public=True, no_cache=True)
+async def abanners_list_api(request):
+    payload, etag = await aget_banners_payload(is_pretty_requested(request))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(payload, content_type='application/json')
+    response.headers['ETag'] = etag
+    return response
+
+
+@cache_control(public=True, no_cache=True)
+async def aproduct_list_api(request):
+    pretty = is_pretty_requested(request)
+    version = await aget_menu_version()
+    etag = make_catalog_etag(version, pretty)
+    last_modified = int(get_menu_modified_at(version).timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        payload = await aget_catalog_payload(version, pretty)
+        response = HttpResponse(payload, content_type='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    return response
 
 
 @api_view(['POST'])
 @transaction.atomic
 def register_order(request):
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        if len(idempotency_key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({'detail': 'Слишком длинный Idempotency-Key'}, status=400)
+
+        fingerprint = get_request_fingerprint(request.data)
+        idempotency_record, created = claim_idempotency_key(idempotency_key, fingerprint)
+        if not created:
+            if idempotency_record.fingerprint != fingerprint:
+                return Response(
+                    {'detail': 'Idempotency-Key уже использован для другого заказа'},
+                    status=422,
+                )
+            return Response(
+                idempotency_record.response,
+                status=idempotency_record.status_code,
+                headers={'Idempotent-Replayed': 'true'},
+            )
+
     serializer = OrderSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
-    order = Order.objects.create(
-        firstname=serializer.validated_data['firstname'],
-        lastname=serializer.validated_data['lastname'],
-        phonenumber=serializer.validated_data['phonenumber'],
-        address=serializer.validated_data['address']
-    )
-
-    products_fields = serializer.validated_data['products']
-    products_objects = [
-        OrderProduct(
-            order=order,
-            product=item['product'],
-            quantity=item['quantity'],
-            final_price=item['product'].price,
-        )
-        for item in products_fields
-    ]
-    OrderProduct.objects.bulk_create(products_objects)
+    order, = create_orders([serializer.validated_data])
 
     order_serializer = OrderSerializer(order)
+    if idempotency_key:
+        idempotency_record.order = order
+        idempotency_record.status_code = 200
+        idempotency_record.response = order_serializer.data
+        idempotency_record.save(update_fields=['order', 'status_code', 'response'])
     return Response(order_serializer.data)
+
+
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+@throttle_classes([OrdersBatchThrottle])
+@transaction.atomic
+def register_orders_batch(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list):
+        return Response({'detail': 'Ожидается список заказов'}, status=400)
+    if len(orders_data) > settings.ORDERS_BATCH_MAX_SIZE:
+        return Response(
+            {'detail': f'Не больше {settings.ORDERS_BATCH_MAX_SIZE} заказов за раз'},
+            status=400,
+        )
+
+    context = {'preloaded_products': preload_order_products(orders_data)}
+    results = []
+    valid_orders = []
+    for index, order_data in enumerate(orders_data):
+        serializer = OrderSerializer(data=order_data, context=context)
+        if serializer.is_valid():
+            valid_orders.append((index, serializer.validated_data))
+        else:
+            results.append({'index': index, 'errors': serializer.errors})
+
+    orders = create_orders([order_data for _, order_data in valid_orders])
+    for (index, _), order in zip(valid_orders, orders):
+        results.append({'index': index, 'order': OrderSerializer(order).data})
+
+    results.sort(key=lambda result: result['index'])
+    return Response({
+        'created': len(orders),
+        'failed': len(results) - len(orders),
+        'results': results,
+    })
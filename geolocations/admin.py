@@ -1,3 +1,31 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import GeocodingJob, Location
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = [
+        'address',
+        'lat',
+        'lng',
+    ]
+    search_fields = [
+        'address',
+    ]
+
+
+@admin.register(GeocodingJob)
+class GeocodingJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'address',
+        'status',
+        'attempts',
+        'created_at',
+    ]
+    list_filter = [
+        'status',
+    ]
+    search_fields = [
+        'address',
+    ]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GeolocationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'geolocations'
+
+    def ready(self):
+        from geolocations import signals  # noqa: F401
@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeGeocoderServer:
+    """Local stand-in for the Yandex geocoder with latency injection.
+
+    Answers with the coordinates from `coordinates` (address -> (lat, lon)),
+    an empty result for other addresses, or `status` if it is not 200.
+    """
+
+    def __init__(self, coordinates=None, delay=0, status=200, host='127.0.0.1', port=0):
+        self.coordinates = coordinates or {}
+        self.delay = delay
+        self.status = status
+        self.requests_count = 0
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/1.x'
+
+    def make_handler(self):
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake_server.requests_count += 1
+                time.sleep(fake_server.delay)
+                address = parse_qs(urlparse(self.path).query).get('geocode', [''])[0]
+                body = json.dumps(fake_server.make_response(address)).encode()
+
+                self.send_response(fake_server.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def make_response(self, address):
+        feature_member = []
+        if address in self.coordinates:
+            lat, lon = self.coordinates[address]
+            feature_member.append({'GeoObject': {'Point': {'pos': f'{lon} {lat}'}}})
+        return {'response': {'GeoObjectCollection': {'featureMember': feature_member}}}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
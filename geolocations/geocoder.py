@@ -0,0 +1,114 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class GeocoderUnavailable(requests.RequestException):
+    pass
+
+
+class CircuitOpen(GeocoderUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calls to a failing upstream for `recovery_timeout` seconds.
+
+    After `failure_threshold` failures in a row the breaker opens. Once
+    the timeout passes, one trial call is let through: success closes the
+    breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                return False
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class YandexGeocoder:
+    def __init__(self, apikey, base_url='https://geocode-maps.yandex.ru/1.x',
+                 connect_timeout=3.05, read_timeout=5, retries=2, backoff_factor=0.5,
+                 pool_size=10, circuit_breaker=None):
+        self.apikey = apikey
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=['GET'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch_coordinates(self, address):
+        """Return (lat, lon) of the address or None if it was not found.
+
+        Raises GeocoderUnavailable when the geocoder is down, so callers
+        can retry later instead of storing the address as unknown.
+        """
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpen('Circuit breaker is open')
+
+        try:
+            response = self.session.get(self.base_url, timeout=self.timeout, params={
+                "geocode": address,
+                "apikey": self.apikey,
+                "format": "json",
+            })
+        except requests.RequestException as error:
+            self.circuit_breaker.record_failure()
+            raise GeocoderUnavailable(str(error)) from error
+
+        if response.status_code >= 500:
+            self.circuit_breaker.record_failure()
+            raise GeocoderUnavailable(f'Geocoder responded with {response.status_code}')
+        self.circuit_breaker.record_success()
+
+        if not response.ok:
+            return None
+
+        decoded_response = response.json()
+        if "error" in decoded_response:
+            return None
+
+        found_places = decoded_response['response']['GeoObjectCollection']['featureMember']
+        if not found_places:
+            return None
+
+        try:
+            most_relevant = found_places[0]
+            lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+            return float(lat), float(lon)
+        except (KeyError, ValueError):
+            return None
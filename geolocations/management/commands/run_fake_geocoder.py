@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from geolocations.fake_geocoder import FakeGeocoderServer
+
+
+class Command(BaseCommand):
+    help = 'Запускает локальную заглушку геокодера Яндекса для тестов нагрузки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--delay', type=float, default=0, help='Задержка ответа в секундах')
+        parser.add_argument('--status', type=int, default=200, help='HTTP-статус ответа')
+        parser.add_argument(
+            '--coordinates',
+            help='JSON-файл со словарём {"адрес": [широта, долгота]}',
+        )
+
+    def handle(self, *args, **options):
+        coordinates = {}
+        if options['coordinates']:
+            with open(options['coordinates'], encoding='utf-8') as file:
+                coordinates = json.load(file)
+
+        server = FakeGeocoderServer(
+            coordinates=coordinates,
+            delay=options['delay'],
+            status=options['status'],
+            port=options['port'],
+        )
+        self.stdout.write(f'Заглушка геокодера слушает {server.url}')
+        self.stdout.write('Укажите этот адрес в переменной окружения YANDEX_GEOCODER_URL')
+        try:
+            server.server.serve_forever()
+        except KeyboardInterrupt:
+            server.server.server_close()
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from geolocations.worker import process_geocoding_jobs
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди GeocodingJob'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=2)
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и выйти',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_geocoding_jobs(
+                batch_size=options['batch_size'],
+                max_workers=options['threads'],
+            )
+            if processed:
+                self.stdout.write(f'Обработано адресов: {processed}')
+                continue
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
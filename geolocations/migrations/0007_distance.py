@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geolocations', '0006_geocodingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Distance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(verbose_name='Расстояние, км')),
+                ('location_from', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='geolocations.location', verbose_name='откуда')),
+                ('location_to', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='geolocations.location', verbose_name='куда')),
+            ],
+            options={
+                'verbose_name': 'расстояние',
+                'verbose_name_plural': 'расстояния',
+                'constraints': [models.UniqueConstraint(fields=('location_from', 'location_to'), name='unique_distance_locations'), models.CheckConstraint(condition=models.Q(('location_from__lt', models.F('location_to'))), name='distance_locations_ordered')],
+            },
+        ),
+    ]
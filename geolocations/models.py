@@ -1,10 +1,14 @@
 from django.db import models
+from django.utils import timezone
+
+
+ADDRESS_MAX_LENGTH = 255
 
 
 class Location(models.Model):
     lng = models.DecimalField('Долгота', max_digits=9, decimal_places=6, null=True)
     lat = models.DecimalField('Широта', max_digits=9, decimal_places=6, null=True)
-    address = models.CharField('Адрес', max_length=255, blank=True, unique=True)
+    address = models.CharField('Адрес', max_length=ADDRESS_MAX_LENGTH, blank=True, unique=True)
 
     class Meta:
         verbose_name = 'локация'
@@ -13,3 +17,66 @@ class Location(models.Model):
     def __str__(self):
         return self.address or f"{self.lat}, {self.lng}"
 
+
+class Distance(models.Model):
+    location_from = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='откуда',
+    )
+    location_to = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='куда',
+    )
+    distance = models.FloatField('Расстояние, км')
+
+    class Meta:
+        verbose_name = 'расстояние'
+        verbose_name_plural = 'расстояния'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location_from', 'location_to'],
+                name='unique_distance_locations',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(location_from__lt=models.F('location_to')),
+                name='distance_locations_ordered',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.location_from} — {self.location_to}: {self.distance:.1f} км'
+
+
+class GeocodingJob(models.Model):
+    PENDING = 'pending'
+    IN_PROGRESS = 'in_progress'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает'),
+        (IN_PROGRESS, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    ]
+    address = models.CharField('Адрес', max_length=ADDRESS_MAX_LENGTH, unique=True)
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    created_at = models.DateTimeField('Создано', default=timezone.now)
+    claimed_at = models.DateTimeField('Взято в работу', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'задача геокодирования'
+        verbose_name_plural = 'задачи геокодирования'
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return self.address
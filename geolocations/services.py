@@ -1,66 +1,236 @@
+import hashlib
+from collections import defaultdict
 from functools import lru_cache
 
+import numpy as np
+
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
 from geopy.distance import geodesic
-import requests
-
-from geolocations.models import Location
 
+from geolocations.geocoder import YandexGeocoder
+from geolocations.models import ADDRESS_MAX_LENGTH, Distance, GeocodingJob, Location
 
-def fetch_coordinates(address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": settings.YANDEX_API_GEOCODER_KEY,
-        "format": "json",
-    })
-
-    if not response.ok:
-        return None
 
-    decoded_response = response.json()
-    if "error" in decoded_response:
-        return None
-
-    found_places = decoded_response['response']['GeoObjectCollection']['featureMember']
-    if not found_places:
-        return None
-
-    try:
-        most_relevant = found_places[0]
-        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-        return float(lat), float(lon)
-    except (KeyError, ValueError):
-        return None
+EARTH_RADIUS_KM = 6371.0088
 
 
 @lru_cache(maxsize=None)
-def get_or_create_location(address):
-    if not address:
-        return None
+def get_geocoder():
+    return YandexGeocoder(
+        apikey=settings.YANDEX_API_GEOCODER_KEY,
+        base_url=settings.YANDEX_GEOCODER_URL,
+        connect_timeout=settings.GEOCODER_CONNECT_TIMEOUT,
+        read_timeout=settings.GEOCODER_READ_TIMEOUT,
+    )
 
-    location, created = Location.objects.get_or_create(address=address)
 
-    if created:
-        coords = fetch_coordinates(address)
-        if coords:
-            location.lat, location.lng = coords
-            location.save()
-
-    return location
-
-
-def get_distance_between_addresses(address1, address2):
-    loc1 = get_or_create_location(address1)
-    loc2 = get_or_create_location(address2)
-
-    if not loc1 or not loc2:
-        return None
-
-    if loc1.lat is None or loc1.lng is None or loc2.lat is None or loc2.lng is None:
+def fetch_coordinates(address):
+    return get_geocoder().fetch_coordinates(address)
+
+
+def is_geocodable(address):
+    """Addresses longer than a Location can store are never geocoded."""
+    return bool(address) and len(address) <= ADDRESS_MAX_LENGTH
+
+
+def enqueue_geocoding(*addresses):
+    """Queue addresses without a stored location for the geocoding worker."""
+    addresses = {address for address in addresses if is_geocodable(address)}
+    known_addresses = set(
+        Location.objects
+        .filter(address__in=addresses, lat__isnull=False, lng__isnull=False)
+        .values_list('address', flat=True)
+    )
+    GeocodingJob.objects.bulk_create(
+        [GeocodingJob(address=address) for address in addresses - known_addresses],
+        ignore_conflicts=True,
+    )
+
+
+def get_coordinates_cache_key(address):
+    address_hash = hashlib.md5(address.encode('utf-8')).hexdigest()
+    return f'geolocations:coordinates:{address_hash}'
+
+
+def get_addresses_coordinates(addresses):
+    """Return a dict of address to (lat, lng), or None if coordinates are unknown.
+
+    Coordinates are cached in the Django cache, shared between processes.
+    Unknown coordinates are cached for a shorter time, because the worker
+    may still be geocoding the address. Addresses never seen before are
+    queued for geocoding. Empty and overlong addresses are left out.
+    """
+    addresses = {address for address in addresses if is_geocodable(address)}
+    keys = {get_coordinates_cache_key(address): address for address in addresses}
+    cached = cache.get_many(keys)
+    coordinates = {keys[key]: value or None for key, value in cached.items()}
+
+    missing_addresses = addresses - coordinates.keys()
+    if not missing_addresses:
+        return coordinates
+
+    locations = (Location.objects
+                 .filter(address__in=missing_addresses)
+                 .values_list('address', 'lat', 'lng'))
+    found, not_found = {}, {}
+    for address, lat, lng in locations:
+        if lat is None or lng is None:
+            not_found[get_coordinates_cache_key(address)] = ()
+            coordinates[address] = None
+        else:
+            found[get_coordinates_cache_key(address)] = (float(lat), float(lng))
+            coordinates[address] = (float(lat), float(lng))
+
+    new_addresses = missing_addresses - coordinates.keys()
+    if new_addresses:
+        enqueue_geocoding(*new_addresses)
+        for address in new_addresses:
+            not_found[get_coordinates_cache_key(address)] = ()
+            coordinates[address] = None
+
+    cache.set_many(found, timeout=settings.GEOCODE_CACHE_TIMEOUT)
+    cache.set_many(not_found, timeout=settings.GEOCODE_NEGATIVE_CACHE_TIMEOUT)
+    return coordinates
+
+
+def get_coordinates(address):
+    if not address:
         return None
-
-    coords1 = (float(loc1.lat), float(loc1.lng))
-    coords2 = (float(loc2.lat), float(loc2.lng))
-
-    return geodesic(coords1, coords2).km
+    return get_addresses_coordinates([address]).get(address)
+
+
+def invalidate_coordinates(address):
+    cache.delete(get_coordinates_cache_key(address))
+
+
+def get_distances_from(origin, destinations, exact_top_k=0):
+    """Return an array of distances in km from origin to each destination.
+
+    `origin` is a (lat, lng) pair and `destinations` is a sequence or an
+    (N, 2) array of them. All distances come from one vectorized haversine
+    pass. The `exact_top_k` nearest are then recomputed with geodesic,
+    which is about 0.5% more precise but much slower.
+    """
+    destinations = np.asarray(destinations, dtype=float).reshape(-1, 2)
+    lat1, lng1 = np.radians(origin)
+    lat2, lng2 = np.radians(destinations).T
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+    exact_top_k = min(exact_top_k, len(distances))
+    if exact_top_k:
+        nearest = np.argpartition(distances, exact_top_k - 1)[:exact_top_k]
+        for index in nearest:
+            distances[index] = geodesic(origin, tuple(destinations[index])).km
+    return distances
+
+
+def save_distances(origin, destinations):
+    """Store distances from the origin to destinations, replacing old ones.
+
+    All locations must have coordinates.
+    """
+    destinations = [destination for destination in destinations if destination.id != origin.id]
+    if not destinations:
+        return
+
+    distances = get_distances_from(
+        (float(origin.lat), float(origin.lng)),
+        [(float(destination.lat), float(destination.lng)) for destination in destinations],
+        exact_top_k=settings.DISTANCE_EXACT_TOP_K,
+    )
+    Distance.objects.bulk_create(
+        [
+            Distance(
+                location_from=min(origin, destination, key=lambda location: location.id),
+                location_to=max(origin, destination, key=lambda location: location.id),
+                distance=float(distance),
+            )
+            for destination, distance in zip(destinations, distances)
+        ],
+        update_conflicts=True,
+        unique_fields=['location_from', 'location_to'],
+        update_fields=['distance'],
+    )
+
+
+def get_stored_distances(addresses_from, addresses_to):
+    addresses_from, addresses_to = set(addresses_from), set(addresses_to)
+    distances = (
+        Distance.objects
+        .filter(
+            Q(location_from__address__in=addresses_from, location_to__address__in=addresses_to)
+            | Q(location_from__address__in=addresses_to, location_to__address__in=addresses_from)
+        )
+        .values_list('location_from__address', 'location_to__address', 'distance')
+    )
+    stored_distances = {}
+    for address_from, address_to, distance in distances:
+        stored_distances[address_from, address_to] = distance
+        stored_distances[address_to, address_from] = distance
+    return stored_distances
+
+
+def get_distances(address_pairs):
+    """Return a dict of (address_from, address_to) to distance in km.
+
+    Distances are read from the stored matrix with one query. Pairs
+    missing from it are computed from coordinates and stored. Pairs with
+    unknown coordinates get None.
+    """
+    address_pairs = set(address_pairs)
+    addresses_from = {address_from for address_from, _ in address_pairs}
+    addresses_to = {address_to for _, address_to in address_pairs}
+    stored_distances = get_stored_distances(addresses_from, addresses_to)
+
+    distances = {pair: stored_distances.get(pair) for pair in address_pairs}
+    missing_pairs = [pair for pair, distance in distances.items() if distance is None]
+    if not missing_pairs:
+        return distances
+
+    coordinates = get_addresses_coordinates({address for pair in missing_pairs for address in pair})
+    computable_pairs = [
+        (address_from, address_to) for address_from, address_to in missing_pairs
+        if coordinates.get(address_from) and coordinates.get(address_to)
+    ]
+    if not computable_pairs:
+        return distances
+
+    destinations_by_origin = defaultdict(list)
+    for address_from, address_to in computable_pairs:
+        destinations_by_origin[address_from].append(address_to)
+    for origin, destination_addresses in destinations_by_origin.items():
+        origin_distances = get_distances_from(
+            coordinates[origin],
+            [coordinates[address] for address in destination_addresses],
+            exact_top_k=settings.DISTANCE_EXACT_TOP_K,
+        )
+        for address, distance in zip(destination_addresses, origin_distances):
+            distances[origin, address] = float(distance)
+
+    locations = Location.objects.in_bulk(
+        {address for pair in computable_pairs for address in pair},
+        field_name='address',
+    )
+    new_distances = []
+    for address_from, address_to in computable_pairs:
+        if address_from not in locations or address_to not in locations:
+            continue
+        location_from, location_to = sorted(
+            [locations[address_from], locations[address_to]],
+            key=lambda location: location.id,
+        )
+        if location_from.id == location_to.id:
+            continue
+        new_distances.append(Distance(
+            location_from=location_from,
+            location_to=location_to,
+            distance=distances[address_from, address_to],
+        ))
+    Distance.objects.bulk_create(new_distances, ignore_conflicts=True)
+
+    return distances
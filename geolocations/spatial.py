@@ -0,0 +1,122 @@
+import heapq
+import math
+from collections import defaultdict
+
+from geolocations.services import get_distances_from
+
+
+KM_PER_DEGREE = 111.195
+
+
+class SpatialGrid:
+    """In-memory index of points bucketed into square cells of `cell_size` degrees.
+
+    Points are (key, lat, lng) triples. Queries only look at cells that
+    can hold an answer, so their cost depends on the local density of
+    points rather than on their total number.
+    """
+
+    def __init__(self, points, cell_size=0.05):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.points = []
+        for key, lat, lng in points:
+            self.cells[self.get_cell(lat, lng)].append((key, lat, lng))
+            self.points.append((key, lat, lng))
+        self.size = len(self.points)
+        self.cells = dict(self.cells)
+        rows = [row for row, _ in self.cells]
+        columns = [column for _, column in self.cells]
+        self.bounds = (min(rows), max(rows), min(columns), max(columns)) if self.cells else None
+
+    def get_cell(self, lat, lng):
+        return math.floor(lat / self.cell_size), math.floor(lng / self.cell_size)
+
+    def get_ring_cells(self, center, ring):
+        row, column = center
+        if ring == 0:
+            return [center]
+        cells = []
+        for offset in range(-ring, ring + 1):
+            cells.extend([
+                (row - ring, column + offset),
+                (row + ring, column + offset),
+            ])
+        for offset in range(-ring + 1, ring):
+            cells.extend([
+                (row + offset, column - ring),
+                (row + offset, column + ring),
+            ])
+        return cells
+
+    def measure(self, lat, lng, candidates):
+        if not candidates:
+            return []
+        distances = get_distances_from(
+            (lat, lng),
+            [(point_lat, point_lng) for _, point_lat, point_lng in candidates],
+        )
+        keys = [key for key, _, _ in candidates]
+        return sorted(zip(keys, distances.tolist()), key=lambda item: item[1])
+
+    def get_max_ring(self, center):
+        """Ring that covers every occupied cell when scanned around `center`."""
+        min_row, max_row, min_column, max_column = self.bounds
+        row, column = center
+        return max(row - min_row, max_row - row, column - min_column, max_column - column, 0)
+
+    def within(self, lat, lng, radius_km):
+        """Return (key, distance) pairs closer than `radius_km`, nearest first."""
+        lat_cells = math.ceil(radius_km / KM_PER_DEGREE / self.cell_size)
+        lng_scale = max(math.cos(math.radians(min(abs(lat) + radius_km / KM_PER_DEGREE, 89))), 0.01)
+        lng_cells = math.ceil(radius_km / (KM_PER_DEGREE * lng_scale) / self.cell_size)
+
+        row, column = self.get_cell(lat, lng)
+        if (2 * lat_cells + 1) * (2 * lng_cells + 1) > len(self.cells):
+            # A huge radius: walking the occupied cells is cheaper than the window
+            candidates = [
+                point
+                for (cell_row, cell_column), points in self.cells.items()
+                if abs(cell_row - row) <= lat_cells and abs(cell_column - column) <= lng_cells
+                for point in points
+            ]
+        else:
+            candidates = []
+            for cell_row in range(row - lat_cells, row + lat_cells + 1):
+                for cell_column in range(column - lng_cells, column + lng_cells + 1):
+                    candidates.extend(self.cells.get((cell_row, cell_column), []))
+
+        return [(key, distance) for key, distance in self.measure(lat, lng, candidates) if distance <= radius_km]
+
+    def nearest(self, lat, lng, count):
+        """Return up to `count` (key, distance) pairs nearest to the point.
+
+        Rings of cells around the point are scanned until every point
+        outside them is provably farther than the current `count`-th best.
+        Only the points a ring adds are measured. A point far from all the
+        others, where rings would hold more cells than the index itself,
+        is answered with one vectorized pass over all points.
+        """
+        if count <= 0 or not self.size:
+            return []
+
+        center = self.get_cell(lat, lng)
+        max_ring = self.get_max_ring(center)
+        nearest = []
+        for ring in range(max_ring + 1):
+            ring_cells = self.get_ring_cells(center, ring)
+            if len(ring_cells) > len(self.cells):
+                return self.measure(lat, lng, self.points)[:count]
+
+            candidates = [point for cell in ring_cells for point in self.cells.get(cell, [])]
+            if candidates:
+                ring_nearest = self.measure(lat, lng, candidates)[:count]
+                nearest = list(heapq.merge(nearest, ring_nearest, key=lambda item: item[1]))[:count]
+
+            if len(nearest) == count:
+                lng_scale = max(math.cos(math.radians(min(abs(lat) + ring * self.cell_size, 89))), 0.01)
+                unexplored_distance = ring * self.cell_size * KM_PER_DEGREE * lng_scale
+                if nearest[-1][1] <= unexplored_distance:
+                    break
+
+        return nearest
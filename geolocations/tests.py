@@ -1,3 +1,225 @@
-from django.test import TestCase
+import random
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from geopy.distance import geodesic
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from geolocations.fake_geocoder import FakeGeocoderServer
+from geolocations.geocoder import CircuitBreaker, CircuitOpen, GeocoderUnavailable, YandexGeocoder
+from geolocations.models import Distance, GeocodingJob, Location
+from geolocations.services import enqueue_geocoding, get_coordinates, get_distances, get_distances_from
+from geolocations.spatial import SpatialGrid
+from geolocations.worker import MAX_ATTEMPTS, process_geocoding_jobs
+
+
+class GeocodingWorkerTest(TestCase):
+    def test_worker_stores_coordinates(self):
+        coordinates = {
+            'Москва, Тверская 1': (55.757, 37.613),
+            'Нет такого адреса': None,
+        }
+        enqueue_geocoding(*coordinates)
+
+        processed = process_geocoding_jobs(geocoder=coordinates.get)
+
+        self.assertEqual(processed, 2)
+        self.assertFalse(GeocodingJob.objects.exists())
+        location = Location.objects.get(address='Москва, Тверская 1')
+        self.assertEqual((location.lat, location.lng), (Decimal('55.757'), Decimal('37.613')))
+        location = Location.objects.get(address='Нет такого адреса')
+        self.assertIsNone(location.lat)
+
+    def test_known_addresses_are_not_queued(self):
+        Location.objects.create(address='Москва, Тверская 1', lat=55.757, lng=37.613)
+
+        enqueue_geocoding('Москва, Тверская 1', 'Москва, Тверская 1', '')
+
+        self.assertFalse(GeocodingJob.objects.exists())
+
+    def test_failed_requests_are_retried(self):
+        def unavailable_geocoder(address):
+            raise requests.ConnectionError()
+
+        enqueue_geocoding('Москва, Тверская 1')
+
+        for attempt in range(MAX_ATTEMPTS):
+            self.assertEqual(process_geocoding_jobs(geocoder=unavailable_geocoder), 1)
+
+        job = GeocodingJob.objects.get()
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+        self.assertEqual(job.status, GeocodingJob.FAILED)
+        self.assertEqual(process_geocoding_jobs(geocoder=unavailable_geocoder), 0)
+        self.assertFalse(Location.objects.exists())
+
+    def test_open_circuit_does_not_spend_attempts(self):
+        def short_circuited_geocoder(address):
+            raise CircuitOpen()
+
+        enqueue_geocoding('Москва, Тверская 1')
+
+        self.assertEqual(process_geocoding_jobs(geocoder=short_circuited_geocoder), 0)
+        job = GeocodingJob.objects.get()
+        self.assertEqual((job.attempts, job.status), (0, GeocodingJob.PENDING))
+
+
+class YandexGeocoderTest(SimpleTestCase):
+    def make_geocoder(self, server, **kwargs):
+        return YandexGeocoder(apikey='key', base_url=server.url, backoff_factor=0, **kwargs)
+
+    def test_coordinates_are_parsed(self):
+        with FakeGeocoderServer({'Москва, Тверская 1': (55.757, 37.613)}) as server:
+            geocoder = self.make_geocoder(server)
+
+            self.assertEqual(geocoder.fetch_coordinates('Москва, Тверская 1'), (55.757, 37.613))
+            self.assertIsNone(geocoder.fetch_coordinates('Нет такого адреса'))
+
+    def test_server_errors_are_retried(self):
+        with FakeGeocoderServer(status=503) as server:
+            geocoder = self.make_geocoder(server, retries=2)
+
+            with self.assertRaises(GeocoderUnavailable):
+                geocoder.fetch_coordinates('Москва, Тверская 1')
+            self.assertEqual(server.requests_count, 3)
+
+    def test_slow_responses_time_out(self):
+        with FakeGeocoderServer(delay=0.5) as server:
+            geocoder = self.make_geocoder(server, read_timeout=0.1, retries=0)
+
+            with self.assertRaises(GeocoderUnavailable):
+                geocoder.fetch_coordinates('Москва, Тверская 1')
+
+    def test_circuit_breaker_short_circuits_failing_geocoder(self):
+        with FakeGeocoderServer(status=500) as server:
+            geocoder = self.make_geocoder(
+                server,
+                retries=0,
+                circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60),
+            )
+
+            for attempt in range(5):
+                with self.assertRaises(GeocoderUnavailable):
+                    geocoder.fetch_coordinates('Москва, Тверская 1')
+            self.assertEqual(server.requests_count, 2)
+
+
+class CoordinatesCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_coordinates_are_cached(self):
+        Location.objects.create(address='Москва, Тверская 1', lat=55.757, lng=37.613)
+
+        self.assertEqual(get_coordinates('Москва, Тверская 1'), (55.757, 37.613))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_coordinates('Москва, Тверская 1'), (55.757, 37.613))
+
+    def test_corrected_location_invalidates_cache(self):
+        location = Location.objects.create(address='Москва, Тверская 1', lat=55.757, lng=37.613)
+        get_coordinates('Москва, Тверская 1')
+
+        location.lat, location.lng = 55.758, 37.614
+        location.save()
+
+        self.assertEqual(get_coordinates('Москва, Тверская 1'), (55.758, 37.614))
+
+    def test_unknown_address_is_queued_and_cached_as_missing(self):
+        self.assertIsNone(get_coordinates('Москва, Тверская 1'))
+        self.assertTrue(GeocodingJob.objects.filter(address='Москва, Тверская 1').exists())
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_coordinates('Москва, Тверская 1'))
+
+        process_geocoding_jobs(geocoder=lambda address: (55.757, 37.613))
+        self.assertEqual(get_coordinates('Москва, Тверская 1'), (55.757, 37.613))
+
+    def test_overlong_address_is_not_geocoded(self):
+        address = 'Москва, ' + 'очень длинная улица ' * 20
+
+        self.assertIsNone(get_coordinates(address))
+        enqueue_geocoding(address)
+        self.assertFalse(GeocodingJob.objects.exists())
+
+
+class DistancesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_distances_are_computed_and_stored(self):
+        Location.objects.create(address='Москва, Тверская 1', lat=55.757, lng=37.613)
+        Location.objects.create(address='Москва, Арбат 1', lat=55.751, lng=37.598)
+
+        distances = get_distances([('Москва, Тверская 1', 'Москва, Арбат 1')])
+
+        self.assertAlmostEqual(distances['Москва, Тверская 1', 'Москва, Арбат 1'], 1.13, delta=0.05)
+        self.assertTrue(Distance.objects.exists())
+
+    def test_blank_and_unknown_addresses_have_no_distance(self):
+        Location.objects.create(address='Москва, Тверская 1', lat=55.757, lng=37.613)
+
+        distances = get_distances([('Москва, Тверская 1', ''), ('Москва, Тверская 1', 'Нет такого адреса')])
+
+        self.assertEqual(distances, {
+            ('Москва, Тверская 1', ''): None,
+            ('Москва, Тверская 1', 'Нет такого адреса'): None,
+        })
+
+
+class DistancesFromTest(SimpleTestCase):
+    origin = (55.757, 37.613)
+    destinations = [(55.751, 37.618), (59.939, 30.316), (55.796, 49.106), (55.757, 37.613)]
+
+    def test_haversine_is_close_to_geodesic(self):
+        distances = get_distances_from(self.origin, self.destinations)
+
+        for destination, distance in zip(self.destinations, distances):
+            self.assertAlmostEqual(distance, geodesic(self.origin, destination).km, delta=distance * 0.005 + 1e-9)
+
+    def test_nearest_destinations_are_exact(self):
+        distances = get_distances_from(self.origin, self.destinations, exact_top_k=2)
+
+        self.assertEqual(distances[0], geodesic(self.origin, self.destinations[0]).km)
+        self.assertEqual(distances[3], 0)
+
+
+class SpatialGridTest(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(1)
+        self.points = [
+            (number, generator.uniform(55.5, 56), generator.uniform(37.3, 37.9))
+            for number in range(300)
+        ]
+        self.grid = SpatialGrid(self.points, cell_size=0.02)
+        self.origin = (55.757, 37.613)
+        distances = get_distances_from(self.origin, [(lat, lng) for _, lat, lng in self.points])
+        self.ranked = sorted(zip(range(300), distances.tolist()), key=lambda item: item[1])
+
+    def test_nearest_matches_full_scan(self):
+        for count in [1, 5, 50, 300, 400]:
+            self.assertEqual(self.grid.nearest(*self.origin, count), self.ranked[:count])
+
+    def test_within_matches_full_scan(self):
+        for radius in [0.5, 3, 20, 100]:
+            expected = [(key, distance) for key, distance in self.ranked if distance <= radius]
+            self.assertEqual(self.grid.within(*self.origin, radius), expected)
+
+    def test_distant_origin_falls_back_to_one_pass(self):
+        origin = (43.1, 131.9)
+        distances = get_distances_from(origin, [(lat, lng) for _, lat, lng in self.points])
+        ranked = sorted(zip(range(300), distances.tolist()), key=lambda item: item[1])
+
+        with mock.patch.object(self.grid, 'measure', wraps=self.grid.measure) as measure:
+            self.assertEqual(self.grid.nearest(*origin, 3), ranked[:3])
+        self.assertEqual(measure.call_count, 1)
+
+        with mock.patch.object(self.grid, 'measure', wraps=self.grid.measure) as measure:
+            self.assertEqual(self.grid.within(*origin, 7000), ranked)
+        self.assertEqual(measure.call_count, 1)
+
+    def test_empty_grid(self):
+        grid = SpatialGrid([])
+
+        self.assertEqual(grid.nearest(*self.origin, 3), [])
+        self.assertEqual(grid.within(*self.origin, 10), [])
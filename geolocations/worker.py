@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.utils import timezone
+
+from geolocations.geocoder import CircuitOpen
+from geolocations.models import GeocodingJob, Location
+from geolocations.services import fetch_coordinates
+
+
+MAX_ATTEMPTS = 5
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def claim_jobs(batch_size):
+    """Mark a batch of pending jobs as taken so other workers skip them.
+
+    Jobs left in progress longer than CLAIM_TIMEOUT belong to a crashed
+    worker and are claimed again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            GeocodingJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=[GeocodingJob.PENDING, GeocodingJob.IN_PROGRESS])
+            .exclude(status=GeocodingJob.IN_PROGRESS, claimed_at__gt=now - CLAIM_TIMEOUT)
+            .order_by('created_at')[:batch_size]
+        )
+        GeocodingJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=GeocodingJob.IN_PROGRESS,
+            claimed_at=now,
+        )
+    return jobs
+
+
+def save_coordinates(address, coords):
+    location, _ = Location.objects.get_or_create(address=address)
+    if coords:
+        location.lat, location.lng = coords
+        location.save()
+    return location
+
+
+def process_geocoding_jobs(geocoder=fetch_coordinates, batch_size=50, max_workers=4):
+    """Geocode one batch of queued addresses.
+
+    Only the geocoder calls run in the thread pool, the database is
+    written from the calling thread. Returns the number of addresses sent
+    to the geocoder. Jobs short-circuited by an open breaker are put back
+    without spending an attempt.
+    """
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0
+
+    def geocode(address):
+        try:
+            return geocoder(address), None
+        except requests.RequestException as error:
+            return None, error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(geocode, [job.address for job in jobs]))
+
+    processed = 0
+    for job, (coords, error) in zip(jobs, results):
+        if error is None:
+            save_coordinates(job.address, coords)
+            job.delete()
+            processed += 1
+            continue
+
+        if not isinstance(error, CircuitOpen):
+            job.attempts += 1
+            processed += 1
+        job.status = GeocodingJob.FAILED if job.attempts >= MAX_ATTEMPTS else GeocodingJob.PENDING
+        job.claimed_at = None
+        job.save(update_fields=['attempts', 'status', 'claimed_at'])
+
+    return processed
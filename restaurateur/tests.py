@@ -1,3 +1,255 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from foodcartapp.models import Order, Restaurant, RestaurantMenuItem
+from foodcartapp.testing import create_order, create_products, create_restaurants
+from restaurateur.views import ORDER_CHANGES_SHORT_POLL_DELAY
+
+
+class OrderEligibilityBackendsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = create_products(range(5))
+        restaurants = create_restaurants(range(4))
+        menus = [
+            {0: True, 1: True, 2: True, 3: True, 4: True},
+            {0: True, 1: True, 2: False},
+            {1: True, 2: True, 3: True},
+            {},
+        ]
+        for restaurant, menu in zip(restaurants, menus):
+            for product_number, availability in menu.items():
+                RestaurantMenuItem.objects.create(
+                    restaurant=restaurant,
+                    product=products[product_number],
+                    availability=availability,
+                )
+
+        carts = [
+            [0],
+            [0, 1],
+            [0, 2],
+            [1, 2, 3],
+            [4],
+            [],
+        ]
+        for cart in carts:
+            create_order([products[product_number] for product_number in cart], quantity=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_available_restaurant_ids(self):
+        return {
+            order.id: [restaurant.id for restaurant in order.available_restaurants]
+            for order in Order.objects.order_by('id').available_for_order()
+        }
+
+    def test_sql_backend_matches_python_backend(self):
+        with override_settings(ORDER_ELIGIBILITY_BACKEND='python'):
+            python_result = self.get_available_restaurant_ids()
+        with override_settings(ORDER_ELIGIBILITY_BACKEND='sql'):
+            sql_result = self.get_available_restaurant_ids()
+
+        self.assertEqual(python_result, sql_result)
+        self.assertEqual(
+            [len(restaurant_ids) for restaurant_ids in python_result.values()],
+            [2, 2, 1, 2, 1, 0],
+        )
+
+
+class OrderBoardTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='password', is_staff=True)
+        cls.restaurant = Restaurant.objects.create(name='Ресторан', address='Москва')
+        registrated_at = timezone.now()
+        statuses = ['given_to_courier', 'waiting_for_acceptation', 'completed', 'sent_to_restaurant']
+        for number in range(12):
+            create_order(
+                status=statuses[number % len(statuses)],
+                cooking_by=cls.restaurant if number % 2 else None,
+                registrated_at=registrated_at - datetime.timedelta(days=number % 3),
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.manager)
+
+    def get_board_ids(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids.extend(item['id'] for item in response.context['order_items'])
+            url = response.context['next_page_url']
+        return ids
+
+    @mock.patch('restaurateur.views.ORDER_BOARD_PAGE_SIZE', 2)
+    def test_pages_cover_board_in_order(self):
+        expected_ids = list(Order.objects.on_board().values_list('id', flat=True))
+
+        self.assertEqual(len(expected_ids), 9)
+        self.assertEqual(self.get_board_ids('/manager/orders/'), expected_ids)
+
+    @mock.patch('restaurateur.views.ORDER_BOARD_PAGE_SIZE', 2)
+    def test_filters_are_kept_between_pages(self):
+        url = f'/manager/orders/?status=sent_to_restaurant&restaurant={self.restaurant.id}'
+        expected_ids = list(
+            Order.objects.on_board()
+            .filter(status='sent_to_restaurant', cooking_by=self.restaurant)
+            .values_list('id', flat=True)
+        )
+
+        self.assertTrue(expected_ids)
+        self.assertEqual(self.get_board_ids(url), expected_ids)
+
+    def test_date_filters_include_whole_days(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        expected_ids = [
+            order.id
+            for order in Order.objects.on_board()
+            if timezone.localtime(order.registrated_at).date() == yesterday
+        ]
+
+        self.assertTrue(expected_ids)
+        self.assertEqual(
+            self.get_board_ids(f'/manager/orders/?date_from={yesterday}&date_to={yesterday}'),
+            expected_ids,
+        )
+
+    def test_invalid_cursor_is_reported(self):
+        response = self.client.get('/manager/orders/?after=broken')
+
+        self.assertEqual(response.context['order_items'], [])
+        self.assertTrue(response.context['filter_form'].errors)
+
+
+class OrderChangesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='password', is_staff=True)
+        cls.order = create_order()
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch('restaurateur.views.ORDER_CHANGES_LAG', datetime.timedelta(0)))
+        self.enterContext(mock.patch('restaurateur.views.ORDER_CHANGES_TIMEOUT', 0))
+        self.client.force_login(self.manager)
+        self.cursor = self.client.get('/manager/orders/').context['changes_cursor']
+
+    def get_changes(self, **params):
+        return self.client.get('/manager/orders/changes/', {'since': self.cursor, **params}).json()
+
+    def test_no_changes(self):
+        changes = self.get_changes()
+
+        self.assertEqual((changes['orders'], changes['removed']), ([], []))
+        self.assertEqual(changes['cursor'], self.cursor)
+
+    def test_changed_and_new_orders_are_sent(self):
+        self.order.comment = 'Позвонить заранее'
+        self.order.save()
+        new_order = create_order(firstname='Пётр', lastname='Петров', phonenumber='+79001234568')
+
+        changes = self.get_changes()
+
+        self.assertEqual([order['id'] for order in changes['orders']], [self.order.id, new_order.id])
+        self.assertIn('Позвонить заранее', changes['orders'][0]['html'])
+        self.assertEqual(changes['cursor'], new_order.updated_at.isoformat())
+        self.assertEqual(self.client.get('/manager/orders/changes/', {'since': changes['cursor']}).json()['orders'], [])
+
+    def test_orders_leaving_board_are_removed(self):
+        self.order.status = 'completed'
+        self.order.save()
+
+        changes = self.get_changes()
+
+        self.assertEqual((changes['orders'], changes['removed']), ([], [self.order.id]))
+
+    def test_wsgi_requests_are_answered_at_once(self):
+        with mock.patch('restaurateur.views.ORDER_CHANGES_TIMEOUT', 25), \
+                mock.patch('restaurateur.views.asyncio.sleep') as sleep:
+            changes = self.get_changes()
+
+        sleep.assert_not_called()
+        self.assertEqual(changes['next_poll_in'], ORDER_CHANGES_SHORT_POLL_DELAY)
+
+    async def test_asgi_requests_are_long_polled(self):
+        await self.async_client.aforce_login(self.manager)
+
+        response = await self.async_client.get('/manager/orders/changes/', {'since': self.cursor})
+
+        self.assertEqual(response.json()['next_poll_in'], 0)
+
+    def test_filters_are_applied(self):
+        self.order.save()
+
+        self.assertEqual(self.get_changes(status='given_to_courier')['removed'], [self.order.id])
+
+
+class ProductsMatrixTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='password', is_staff=True)
+        cls.products = create_products(range(4))
+        cls.restaurants = create_restaurants(reversed(range(5)))
+        for restaurant_number, restaurant in enumerate(cls.restaurants):
+            for product_number, product in enumerate(cls.products):
+                if (restaurant_number + product_number) % 2:
+                    RestaurantMenuItem.objects.create(
+                        restaurant=restaurant,
+                        product=product,
+                        availability=product_number != 3,
+                    )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.manager)
+
+    def get_expected_matrix(self, restaurants):
+        return [
+            [
+                RestaurantMenuItem.objects.filter(restaurant=restaurant, product=product, availability=True).exists()
+                for restaurant in restaurants
+            ]
+            for product in self.products
+        ]
+
+    @mock.patch('restaurateur.views.RESTAURANTS_PER_PAGE', 2)
+    def test_matrix_is_paginated_by_restaurants(self):
+        restaurants = sorted(self.restaurants, key=lambda restaurant: restaurant.name)
+
+        for page in [1, 2, 3]:
+            response = self.client.get('/manager/products/', {'page': page})
+
+            page_restaurants = restaurants[(page - 1) * 2:page * 2]
+            self.assertEqual(list(response.context['restaurants']), page_restaurants)
+            matrix = [availability for _, availability in response.context['products_with_restaurant_availability']]
+            self.assertEqual(matrix, self.get_expected_matrix(page_restaurants))
+
+    def count_warm_matrix_queries(self):
+        self.client.get('/manager/products/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/manager/products/')
+
+        self.assertNotContains(response, '<svg')
+        self.assertFalse([query for query in queries if 'foodcartapp_restaurant' in query['sql']])
+        return len(queries)
+
+    def test_queries_do_not_depend_on_restaurants_count(self):
+        few_restaurants_queries = self.count_warm_matrix_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for restaurant in create_restaurants(range(5, 50)):
+                RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.products[0])
+
+        self.assertEqual(self.count_warm_matrix_queries(), few_restaurants_queries)
+        response = self.client.get('/manager/products/')
+        self.assertEqual(response.context['restaurants'].paginator.count, 50)
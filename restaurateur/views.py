@@ -1,6 +1,15 @@
-from django import forms
-from django.db.models import Prefetch, Case, When, IntegerField, Sum, F, DecimalField
+import asyncio
+import base64
+import datetime
+import time
 
+from asgiref.sync import sync_to_async
+from django import forms
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.core.paginator import Paginator
 from django.shortcuts import redirect, render
 from django.views import View
 from django.urls import reverse_lazy
@@ -9,8 +18,9 @@ from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 
-from foodcartapp.models import Product, Restaurant, Order, OrderProduct
-from geolocations.services import get_distance_between_addresses
+from foodcartapp.models import Product, Restaurant, Order
+from foodcartapp.services import get_available_restaurants, get_eligibility_index
+from geolocations.services import get_distances
 
 
 class Login(forms.Form):
@@ -30,6 +40,52 @@ class Login(forms.Form):
     )
 
 
+class OrderBoardFilter(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус', required=False,
+        choices=[('', 'Все')] + [
+            choice for choice in Order.STATUS_CHOICES if choice[0] != 'completed'
+        ],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Готовит', required=False, empty_label='Все',
+        queryset=Restaurant.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    date_from = forms.DateField(
+        label='С', required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    date_to = forms.DateField(
+        label='По', required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    after = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_after(self):
+        cursor = self.cleaned_data['after']
+        if not cursor:
+            return None
+        try:
+            return decode_board_cursor(cursor)
+        except ValueError:
+            raise forms.ValidationError('Некорректная ссылка на страницу')
+
+
+def encode_board_cursor(order):
+    cursor = f'{order.status_order}|{order.registrated_at.isoformat()}|{order.id}'
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_board_cursor(cursor):
+    try:
+        status_order, registrated_at, order_id = base64.urlsafe_b64decode(cursor).decode().split('|')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f'Invalid cursor: {cursor}')
+    return int(status_order), datetime.datetime.fromisoformat(registrated_at), int(order_id)
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -65,23 +121,30 @@ def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
+RESTAURANTS_PER_PAGE = 10
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    eligibility_index = get_eligibility_index()
+    positions = {
+        restaurant.id: position
+        for position, restaurant in enumerate(eligibility_index.restaurants)
+    }
+    restaurants = sorted(eligibility_index.restaurants, key=lambda restaurant: restaurant.name)
+    restaurants_page = Paginator(restaurants, RESTAURANTS_PER_PAGE).get_page(request.GET.get('page'))
+    restaurant_bits = [1 << positions[restaurant.id] for restaurant in restaurants_page]
 
     products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
-
+    for product in Product.objects.select_related('category'):
+        mask = eligibility_index.product_masks.get(product.id, 0)
         products_with_restaurant_availability.append(
-            (product, ordered_availability)
+            (product, [bool(mask & bit) for bit in restaurant_bits])
         )
 
     return render(request, template_name="products_list.html", context={
         'products_with_restaurant_availability': products_with_restaurant_availability,
-        'restaurants': restaurants,
+        'restaurants': restaurants_page,
     })
 
 
@@ -92,34 +155,45 @@ def view_restaurants(request):
     })
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
-    orders = (
-        Order.objects
-        .exclude(status='completed')
-        .prefetch_related(
-            Prefetch(
-                'items',
-                queryset=OrderProduct.objects.select_related('product')
-            )
-        )
-        .select_related('cooking_by')
-        .annotate(
-            status_order=Case(
-                When(status='waiting_for_acceptation', then=0),
-                When(status='sent_to_restaurant', then=1),
-                When(status='given_to_courier', then=2),
-                default=99,
-                output_field=IntegerField(),
-            )
-        )
-        .order_by('status_order')
-    )
+ORDER_BOARD_PAGE_SIZE = 50
+ORDER_CHANGES_TIMEOUT = 25
+ORDER_CHANGES_POLL_INTERVAL = 1
+ORDER_CHANGES_SHORT_POLL_DELAY = 10
+ORDER_CHANGES_LAG = datetime.timedelta(seconds=2)
 
-    orders = orders.annotate(
-        total_price=Sum(F('items__final_price') * F('items__quantity'), output_field=DecimalField())
+
+def get_day_start(day):
+    """Start of the day in the current time zone.
+
+    Comparing `registrated_at` with bounds, not with `__date`, keeps the
+    filter usable by indexes.
+    """
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def filter_board_orders(filters):
+    orders = Order.objects.on_board().select_related('cooking_by')
+    if filters['status']:
+        orders = orders.filter(status=filters['status'])
+    if filters['restaurant']:
+        orders = orders.filter(cooking_by=filters['restaurant'])
+    if filters['date_from']:
+        orders = orders.filter(registrated_at__gte=get_day_start(filters['date_from']))
+    if filters['date_to']:
+        next_day = filters['date_to'] + datetime.timedelta(days=1)
+        orders = orders.filter(registrated_at__lt=get_day_start(next_day))
+    return orders
+
+
+def get_order_items(orders):
+    restaurants_by_order = get_available_restaurants([order.id for order in orders])
+    for order in orders:
+        order.available_restaurants = restaurants_by_order.get(order.id, [])
+    distances = get_distances(
+        (order.address, restaurant.address)
+        for order in orders
+        for restaurant in order.available_restaurants
     )
-    orders = orders.available_for_order()
 
     order_items = []
     for order in orders:
@@ -130,8 +204,8 @@ def view_orders(request):
 
         if available_for_order:
             for restaurant in available_for_order:
-                distance = get_distance_between_addresses(order.address, restaurant.address)
-                if distance:
+                distance = distances[order.address, restaurant.address]
+                if distance is not None:
                     restaurants_with_distance[restaurant.name] = distance
 
             if not restaurants_with_distance:
@@ -144,7 +218,7 @@ def view_orders(request):
         order_items.append({
             'id': order.id,
             'status': order.get_status_display(),
-            'price': order.total_price or 0,
+            'price': order.total,
             'name': f'{order.firstname} {order.lastname}',
             'phonenumber': order.phonenumber,
             'address': order.address,
@@ -154,5 +228,90 @@ def view_orders(request):
             'cooking_by': order.cooking_by,
             'address_not_found': address_not_found,
         })
+    return order_items
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_orders(request):
+    filter_form = OrderBoardFilter(request.GET)
+    if not filter_form.is_valid():
+        return render(request, 'order_items.html', context={
+            'order_items': [],
+            'filter_form': filter_form,
+        })
+
+    changes_cursor = timezone.now() - ORDER_CHANGES_LAG
+    orders = filter_board_orders(filter_form.cleaned_data)
+    if filter_form.cleaned_data['after']:
+        orders = orders.after(*filter_form.cleaned_data['after'])
+
+    orders = list(orders[:ORDER_BOARD_PAGE_SIZE + 1])
+    next_page_url = None
+    if len(orders) > ORDER_BOARD_PAGE_SIZE:
+        orders = orders[:ORDER_BOARD_PAGE_SIZE]
+        params = request.GET.copy()
+        params['after'] = encode_board_cursor(orders[-1])
+        next_page_url = f'{request.path}?{params.urlencode()}'
+
+    return render(request, 'order_items.html', context={
+        'order_items': get_order_items(orders),
+        'filter_form': filter_form,
+        'next_page_url': next_page_url,
+        'changes_cursor': changes_cursor.isoformat(),
+    })
 
-    return render(request, 'order_items.html', context={'order_items': order_items})
+
+def get_order_changes(request, since, until, next_poll_in):
+    filter_form = OrderBoardFilter(request.GET)
+    if not filter_form.is_valid():
+        return JsonResponse({'errors': filter_form.errors}, status=400)
+
+    changes = dict(
+        Order.objects
+        .filter(updated_at__gt=since, updated_at__lte=until)
+        .values_list('id', 'updated_at')
+    )
+    orders = list(filter_board_orders(filter_form.cleaned_data).filter(id__in=changes))
+    rows = [
+        {'id': item['id'], 'html': render_to_string('order_row.html', {'item': item}, request)}
+        for item in get_order_items(orders)
+    ]
+    return JsonResponse({
+        'cursor': max(changes.values(), default=since).isoformat(),
+        'orders': rows,
+        'removed': sorted(changes.keys() - {order.id for order in orders}),
+        'next_poll_in': next_poll_in,
+    })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+async def view_order_changes(request):
+    """Report orders changed after the `since` cursor.
+
+    Answers with rendered rows of changed orders that still match the
+    board filters and ids of those that left the board. Changes younger
+    than ORDER_CHANGES_LAG are held back, so a transaction committing
+    slightly out of order is not skipped by the cursor.
+
+    Under ASGI the request is a long-poll: it waits up to
+    ORDER_CHANGES_TIMEOUT seconds for a change without holding a thread.
+    Under WSGI waiting would block a worker, so the view answers at once
+    and tells the board to ask again in ORDER_CHANGES_SHORT_POLL_DELAY
+    seconds.
+    """
+    try:
+        since = datetime.datetime.fromisoformat(request.GET['since'])
+    except (KeyError, ValueError):
+        return JsonResponse({'errors': {'since': ['Укажите курсор изменений']}}, status=400)
+
+    long_poll = isinstance(request, ASGIRequest)
+    deadline = time.monotonic() + (ORDER_CHANGES_TIMEOUT if long_poll else 0)
+    while True:
+        until = timezone.now() - ORDER_CHANGES_LAG
+        changed = Order.objects.filter(updated_at__gt=since, updated_at__lte=until)
+        if await changed.aexists() or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(ORDER_CHANGES_POLL_INTERVAL)
+
+    next_poll_in = 0 if long_poll else ORDER_CHANGES_SHORT_POLL_DELAY
+    return await sync_to_async(get_order_changes)(request, since, until, next_poll_in)
@@ -16,6 +16,19 @@ SECRET_KEY = env('SECRET_KEY')
 DEBUG = env.bool('DEBUG', True)
 
 YANDEX_API_GEOCODER_KEY = env.str("YANDEX_API_GEOCODER", default="")
+YANDEX_GEOCODER_URL = env.str('YANDEX_GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_CONNECT_TIMEOUT = env.float('GEOCODER_CONNECT_TIMEOUT', 3.05)
+GEOCODER_READ_TIMEOUT = env.float('GEOCODER_READ_TIMEOUT', 5)
+GEOCODE_CACHE_TIMEOUT = env.int('GEOCODE_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+GEOCODE_NEGATIVE_CACHE_TIMEOUT = env.int('GEOCODE_NEGATIVE_CACHE_TIMEOUT', 60)
+DISTANCE_EXACT_TOP_K = env.int('DISTANCE_EXACT_TOP_K', 5)
+
+ORDER_ELIGIBILITY_BACKEND = env.str('ORDER_ELIGIBILITY_BACKEND', 'python')
+IDEMPOTENCY_KEY_TTL = env.int('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+ORDERS_BATCH_MAX_SIZE = env.int('ORDERS_BATCH_MAX_SIZE', 500)
+ORDERS_BATCH_THROTTLE_RATE = env.str('ORDERS_BATCH_THROTTLE_RATE', '60/hour')
+ASYNC_API = env.bool('ASYNC_API', False)
+INLINE_STOREFRONT_DATA = env.bool('INLINE_STOREFRONT_DATA', True)
 
 ALLOWED_HOSTS = env.list('ALLOWED_HOSTS', ['127.0.0.1', 'localhost'])
 
@@ -31,6 +44,7 @@ INSTALLED_APPS = [
     'debug_toolbar',
     'phonenumber_field',
     'rest_framework',
+    'rest_framework.authtoken',
     'geolocations'
 ]
 
@@ -89,6 +103,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'star_burger.wsgi.application'
+ASGI_APPLICATION = 'star_burger.asgi.application'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
@@ -97,6 +112,16 @@ DATABASES = {
     'default': dj_database_url.parse(env.str('DB_URL'))
 }
 
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', default='locmem://?max_entries=10000'),
+}
+
+REST_FRAMEWORK = {
+    'DEFAULT_THROTTLE_RATES': {
+        'orders_batch': ORDERS_BATCH_THROTTLE_RATE,
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -136,3 +161,18 @@ STATICFILES_DIRS = [
 ]
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'static_collected')
+
+# Hashed names are looked up in the manifest written by collectstatic,
+# so the plain storage is kept for development.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage'
+            if DEBUG else
+            'star_burger.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
@@ -0,0 +1,42 @@
+import gzip
+import os
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz and .br copies of text assets.
+
+    Both the original and the hashed names get compressed siblings, so a
+    web server with gzip_static/brotli_static can send them as is.
+    Copies that turn out not smaller than the original are skipped.
+    """
+
+    compressible_extensions = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.ico', '.xml'}
+    compressors = {
+        '.gz': lambda content: gzip.compress(content, compresslevel=9, mtime=0),
+        '.br': lambda content: brotli.compress(content, quality=11),
+    }
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for original_name, hashed_name in self.hashed_files.items():
+            for name in {original_name, hashed_name}:
+                if os.path.splitext(name)[1].lower() in self.compressible_extensions:
+                    self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        for extension, compressor in self.compressors.items():
+            compressed_name = name + extension
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            compressed = compressor(content)
+            if len(compressed) < len(content):
+                self._save(compressed_name, ContentFile(compressed))
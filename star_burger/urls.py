@@ -17,13 +17,13 @@ Including another URLconf
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from django.shortcuts import render
+from foodcartapp.views import start_page
 
 from . import settings
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', render, kwargs={'template_name': 'index.html'}, name='start_page'),
+    path('', start_page, name='start_page'),
     path('api-auth/', include('rest_framework.urls')),
     path('api/', include('foodcartapp.urls')),
     path('manager/', include('restaurateur.urls')),